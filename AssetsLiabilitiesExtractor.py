@@ -1,10 +1,12 @@
-import pdfplumber
 from tabulate import tabulate
 import re
+from PageTextStore import get_page_store
+from NumberTokenizer import tokenize_page, values_by_line
 
 class AssetsLiabilitiesExtractor:
     def __init__(self, pdf_path):
         self.pdf_path = pdf_path
+        self.page_store = get_page_store(pdf_path)
         # Simplified and more specific rows to match the actual PDFs
         self.rows_to_extract = {
             'assets': [
@@ -22,14 +24,9 @@ class AssetsLiabilitiesExtractor:
             ]
         }
         self.headers = []
-        # Modified number pattern to better match the format in the PDFs
-        self.number_pattern = re.compile(r'-?\d{1,3}(?:,\d{3})*(?:\.\d{2})?')
+        # Set when this extractor's scan ran out of document time
+        self.budget_exhausted = False
         
-    def extract_numbers(self, text):
-        """Extract numbers from text, handling the specific format in the PDFs."""
-        matches = self.number_pattern.findall(text)
-        return [float(num.replace(',', '')) for num in matches if num]
-
     def find_table_start(self, lines):
         """Find where the actual table starts in the PDF."""
         for i, line in enumerate(lines):
@@ -54,46 +51,67 @@ class AssetsLiabilitiesExtractor:
                     return headers
         return headers
 
-    def extract_assets_liabilities(self):
-        table_data = []
-        
-        with pdfplumber.open(self.pdf_path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if not text:
-                    continue
-
-                lines = text.splitlines()
-                table_start = self.find_table_start(lines)
-                
-                if not self.headers:
-                    self.headers = self.extract_headers(lines, table_start)
-                
-                # Process each line after table start
-                for line in lines[table_start:]:
-                    line_lower = line.lower().strip()
-                    
-                    # Match any of our target rows
-                    for section, patterns in self.rows_to_extract.items():
-                        for pattern in patterns:
-                            if pattern in line_lower:
-                                numbers = self.extract_numbers(line)
-                                if numbers:
-                                    row_data = [pattern.title()]
-                                    row_data.extend(numbers)
-                                    if not any(r[0] == row_data[0] for r in table_data):
-                                        table_data.append(row_data)
-                                break
+    def extract_rows(self):
+        """Return the extracted rows, including the DOE row, and set self.headers."""
+        # Reuse rows from a previous version of the document if no page has changed
+        cached = self.page_store.cached_result("assets_liabilities")
+        if cached is not None:
+            table_data = [list(row) for row in cached["rows"]]
+            self.headers = cached["headers"]
+        else:
+            table_data = self.extract_table_data()
 
         # Calculate DOE if we have the necessary data
         if table_data:
             self.add_doe_calculation(table_data)
+        return table_data
+
+    def extract_assets_liabilities(self):
+        table_data = self.extract_rows()
 
         # Format and return the table
         if table_data and self.headers:
-            return tabulate(table_data, headers=self.headers, tablefmt="grid", floatfmt=".2f")
+            return tabulate(table_data, headers=self.headers, tablefmt="grid", floatfmt=".2f") + "\n" + self.page_store.partial_note(self.budget_exhausted)
         return "Could not identify the required table or data in the PDF."
 
+    def extract_table_data(self):
+        table_data = []
+
+        scan = self.page_store.iter_page_texts()
+        for page_number, text in scan:
+            if not text:
+                continue
+
+            lines = text.split("\n")
+            table_start = self.find_table_start(lines)
+            
+            if not self.headers:
+                self.headers = self.extract_headers(lines, table_start)
+            
+            # Tokenize the whole page once; each line then just picks up its own values
+            page_values = values_by_line(tokenize_page(text), len(lines))
+
+            # Process each line after table start
+            for line, line_values in zip(lines[table_start:], page_values[table_start:]):
+                line_lower = line.lower().strip()
+                
+                # Match any of our target rows
+                for section, patterns in self.rows_to_extract.items():
+                    for pattern in patterns:
+                        if pattern in line_lower:
+                            numbers = line_values.tolist()
+                            if numbers:
+                                row_data = [pattern.title()]
+                                row_data.extend(numbers)
+                                if not any(r[0] == row_data[0] for r in table_data):
+                                    table_data.append(row_data)
+                            break
+
+        self.budget_exhausted = scan.exhausted
+        self.page_store.store_result("assets_liabilities", {"rows": [list(row) for row in table_data], "headers": self.headers},
+                                     budget_exhausted=scan.exhausted)
+        return table_data
+
     def add_doe_calculation(self, table_data):
         """Calculate and add Debt over Equity ratio."""
         total_liabilities = None
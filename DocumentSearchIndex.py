@@ -0,0 +1,156 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from PageTextStore import get_page_store
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "our", "the", "this", "to", "was", "what", "which", "who", "with",
+}
+
+# Indexes being built or already built, one per document
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def tokenize(text):
+    return [token for token in re.findall(r"[a-z0-9]+", text.lower()) if token not in STOPWORDS]
+
+
+def is_heading(line):
+    """Section headings in DRHPs are short upper-case lines such as 'OBJECTS OF THE ISSUE'."""
+    letters = [c for c in line if c.isalpha()]
+    return 3 <= len(letters) and len(line) <= 80 and line.upper() == line
+
+
+class DocumentSearchIndex:
+    def __init__(self, pdf_path, passage_lines=8, k1=1.5, b=0.75, heading_weight=3):
+        self.pdf_path = pdf_path
+        self.page_store = get_page_store(pdf_path)
+        # Each page is split into passages of a few lines so answers stay short
+        self.passage_lines = passage_lines
+        self.k1 = k1
+        self.b = b
+        # Heading terms are counted several times so section names rank highly
+        self.heading_weight = heading_weight
+        self.passages = []
+        self.postings = {}
+        self.doc_lengths = []
+        self.avg_doc_length = 0.0
+        # Set when the scan behind build() ran out of document time
+        self.budget_exhausted = False
+        # Set when the document is released; a build in progress stops at the next page
+        self.cancelled = threading.Event()
+
+    def load_or_build(self):
+        """Load the persisted index for this document, building it only if it is missing or stale."""
+        cached = self.page_store.cached_result("search_index")
+        if cached is not None:
+            self.passages = cached["passages"]
+            self.postings = cached["postings"]
+            self.doc_lengths = cached["doc_lengths"]
+        else:
+            self.build()
+            if self.cancelled.is_set():
+                return self
+            self.page_store.store_result("search_index", {
+                "passages": self.passages,
+                "postings": self.postings,
+                "doc_lengths": self.doc_lengths,
+            }, budget_exhausted=self.budget_exhausted)
+        self.avg_doc_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+        return self
+
+    def build(self):
+        postings = defaultdict(list)
+        scan = self.page_store.iter_page_texts()
+        for page_number, text in scan:
+            if self.cancelled.is_set():
+                break
+            lines = [line.strip() for line in text.splitlines() if line.strip()]
+            heading = ""
+            for start in range(0, len(lines), self.passage_lines):
+                chunk = lines[start:start + self.passage_lines]
+                headings = [line for line in chunk if is_heading(line)]
+                if headings:
+                    heading = headings[0]
+
+                counts = Counter(tokenize(" ".join(chunk)))
+                for token in tokenize(heading):
+                    counts[token] += self.heading_weight
+
+                doc_id = len(self.passages)
+                self.passages.append([page_number + 1, heading, "\n".join(chunk)])
+                self.doc_lengths.append(sum(counts.values()))
+                for token, frequency in counts.items():
+                    postings[token].append([doc_id, frequency])
+        self.postings = dict(postings)
+        self.budget_exhausted = scan.exhausted
+
+    def search(self, query, top_k=3):
+        """Return the best (score, page_number, heading, passage) matches for a free-form question."""
+        scores = defaultdict(float)
+        doc_count = len(self.passages)
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings:
+                norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / (self.avg_doc_length or 1)
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(score, *self.passages[doc_id]) for doc_id, score in best]
+
+
+def start_search_index(pdf_path):
+    """Build (or load) the index for a document in a background thread."""
+    with _indexes_lock:
+        if pdf_path not in _indexes:
+            index = DocumentSearchIndex(pdf_path)
+            thread = threading.Thread(target=index.load_or_build, daemon=True)
+            _indexes[pdf_path] = (index, thread)
+            thread.start()
+        return _indexes[pdf_path]
+
+
+def release_search_index(pdf_path):
+    """Forget the in-memory index; it is reloaded from .ipo_cache on next use.
+
+    A build still running is cancelled and waited for, so it does not go on
+    using the document's page store after it is released.
+    """
+    with _indexes_lock:
+        entry = _indexes.pop(pdf_path, None)
+    if entry is not None:
+        index, thread = entry
+        index.cancelled.set()
+        if thread is not threading.current_thread():
+            thread.join()
+
+
+def search_index_size(pdf_path):
+    """Rough bytes held by a loaded index (passage text dominates)."""
+    with _indexes_lock:
+        entry = _indexes.get(pdf_path)
+    if entry is None:
+        return 0
+    index = entry[0]
+    return sum(len(passage[2]) for passage in index.passages) + 16 * len(index.doc_lengths)
+
+
+def search_document(pdf_path, question, top_k=3):
+    index, thread = start_search_index(pdf_path)
+    thread.join()  # Only waits if the background build is still running
+    results = index.search(question, top_k)
+    if not results:
+        return "I'm sorry, I couldn't find anything about that in the document."
+
+    answer = "Best matching passages:\n\n"
+    for score, page_number, heading, passage in results:
+        answer += f"Page {page_number}" + (f" ({heading})" if heading else "") + ":\n"
+        answer += passage + "\n\n"
+    return answer
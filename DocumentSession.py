@@ -0,0 +1,122 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_DOCUMENT_BUDGET = 256 * 1024 * 1024
+DEFAULT_MEMORY_CAP = 1024 * 1024 * 1024
+
+
+class DocumentWorker:
+    """Runs every query for one document on its own background thread."""
+
+    def __init__(self, pdf_path, results, cache_budget=DEFAULT_DOCUMENT_BUDGET):
+        self.pdf_path = pdf_path
+        self.name = os.path.basename(pdf_path)
+        self.cache_budget = cache_budget
+        self.last_used = time.monotonic()
+        self.tasks = queue.Queue()
+        # Shared with the session so the UI thread can poll every document's answers
+        self.results = results
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, function, tag=None):
+        self.last_used = time.monotonic()
+        self.tasks.put((function, tag))
+
+    def run(self):
+        while True:
+            function, tag = self.tasks.get()
+            if function is None:
+                break
+            try:
+                output = function(self.pdf_path)
+            except Exception as e:
+                output = f"Error while processing {self.name}: {e}"
+            self.results.put((self, tag, output))
+
+    def stop(self):
+        self.tasks.put((None, None))
+
+
+class DocumentSession:
+    """Several DRHPs open side by side, each with its own worker and cache budget.
+
+    measure_state(pdf_path) estimates the bytes of cached state held for a
+    document and release_state(pdf_path) drops it; both are supplied by the
+    app, which owns the caches.
+    """
+
+    def __init__(self, measure_state, release_state, memory_cap=DEFAULT_MEMORY_CAP,
+                 document_budget=DEFAULT_DOCUMENT_BUDGET):
+        self.measure_state = measure_state
+        self.release_state = release_state
+        self.memory_cap = memory_cap
+        self.document_budget = document_budget
+        self.results = queue.Queue()
+        # Least recently used document first
+        self.workers = OrderedDict()
+        self.lock = threading.Lock()
+        self.active = None
+
+    def open(self, pdf_path):
+        with self.lock:
+            if pdf_path not in self.workers:
+                self.workers[pdf_path] = DocumentWorker(pdf_path, self.results, self.document_budget)
+            self.workers.move_to_end(pdf_path)
+            self.active = pdf_path
+            return self.workers[pdf_path]
+
+    def close(self, pdf_path):
+        with self.lock:
+            worker = self.workers.pop(pdf_path, None)
+            if self.active == pdf_path:
+                self.active = next(reversed(self.workers), None)
+        if worker:
+            worker.stop()
+            self.release_state(pdf_path)
+
+    def find(self, name):
+        """Resolve a document by file name (or a unique prefix of it)."""
+        with self.lock:
+            matches = [path for path, worker in self.workers.items()
+                       if worker.name.lower().startswith(name.lower())]
+        return matches[0] if len(matches) == 1 else None
+
+    def submit(self, function, target=None, tag=None):
+        """Queue function(pdf_path) for one document, the active one, or "all" open documents."""
+        with self.lock:
+            if target == "all":
+                paths = list(self.workers)
+            else:
+                paths = [target or self.active] if (target or self.active) in self.workers else []
+            for path in paths:
+                self.workers.move_to_end(path)
+                self.workers[path].submit(function, tag)
+        return len(paths)
+
+    def enforce_budgets(self):
+        """Drop state of documents over their own budget, then evict LRU documents over the global cap."""
+        with self.lock:
+            workers = list(self.workers.values())
+        evicted = []
+        sizes = {}
+        for worker in workers:
+            sizes[worker.pdf_path] = self.measure_state(worker.pdf_path)
+            if sizes[worker.pdf_path] > worker.cache_budget:
+                self.release_state(worker.pdf_path)
+                sizes[worker.pdf_path] = 0
+                evicted.append(worker.name)
+
+        total = sum(sizes.values())
+        # Never evict the most recently used document; it is the one being asked about
+        for worker in workers[:-1]:
+            if total <= self.memory_cap:
+                break
+            if sizes[worker.pdf_path]:
+                self.release_state(worker.pdf_path)
+                total -= sizes[worker.pdf_path]
+                evicted.append(worker.name)
+        return evicted
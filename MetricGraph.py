@@ -0,0 +1,44 @@
+import threading
+
+
+class MetricGraph:
+    """Lazily computed, memoized metrics declared as a dependency graph.
+
+    A node is only recomputed when one of its inputs has produced a different
+    value since it was last computed, so any combination of questions about a
+    document runs each base extraction at most once.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.values = {}
+        # Bumped every time a node produces a new value
+        self.versions = {}
+        # Versions of the inputs each cached value was computed from
+        self.input_versions = {}
+        # One evaluation at a time; a second caller waits and then reuses the memoized values
+        self.lock = threading.RLock()
+
+    def add_node(self, name, compute, dependencies=()):
+        self.nodes[name] = (compute, tuple(dependencies))
+
+    def get(self, name):
+        with self.lock:
+            compute, dependencies = self.nodes[name]
+            inputs = [self.get(dependency) for dependency in dependencies]
+            input_versions = tuple(self.versions[dependency] for dependency in dependencies)
+
+            if self.input_versions.get(name) == input_versions:
+                return self.values[name]
+
+            value = compute(*inputs)
+            if name not in self.values or self.values[name] != value:
+                self.versions[name] = self.versions.get(name, 0) + 1
+            self.values[name] = value
+            self.input_versions[name] = input_versions
+            return value
+
+    def invalidate(self, name):
+        """Mark a node stale; dependents recompute only if its new value differs."""
+        with self.lock:
+            self.input_versions.pop(name, None)
@@ -0,0 +1,88 @@
+import re
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# Integer part: Indian lakh/crore grouping (1,23,45,678), western grouping (1,234,567)
+# or plain digits. The trailing lookahead makes the regex backtrack to whichever
+# grouping consumes the whole run of digits.
+_NUMBER = r"(?:\d{1,3}(?:,\d{2})*,\d{3}|\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?(?!,?\d)"
+
+TOKEN_PATTERN = re.compile(
+    rf"\((?P<bracketed>{_NUMBER})\)"                    # (1,234.00) is a negative amount
+    rf"|(?<![\w,-])(?<!\d\.)(?P<number>-?{_NUMBER})"    # 1,23,45,678.90 or -1,234
+    r"|(?<!\S)(?P<nil>[-–—])(?!\S)"           # a lone dash means nil (see tokenize_page)
+)
+
+NumericTokens = namedtuple("NumericTokens", ["values", "lines", "columns"])
+
+
+def _match_value(match):
+    bracketed, number = match.group("bracketed"), match.group("number")
+    if bracketed is not None:
+        return -float(bracketed.replace(",", ""))
+    if number is not None:
+        return float(number.replace(",", ""))
+    return 0.0
+
+
+def parse_amount(text):
+    """Return the value if text is exactly one amount (or a nil dash), else None."""
+    match = TOKEN_PATTERN.fullmatch(text.strip())
+    return _match_value(match) if match else None
+
+
+def tokenize_page(text):
+    """Scan a page once and return every amount with its line and column.
+
+    Values are float64; bracketed amounts are negative and nil dashes are 0.
+    A dash only counts as nil after the first amount on its line, so the
+    dash in a label such as "Total - Non current" is not a value.
+    Columns are character offsets within the line.
+    """
+    starts = []
+    values = []
+    nils = []
+    for match in TOKEN_PATTERN.finditer(text):
+        values.append(_match_value(match))
+        starts.append(match.start())
+        nils.append(match.lastgroup == "nil")
+
+    starts = np.array(starts, dtype=np.int64)
+    nils = np.array(nils, dtype=bool)
+    # Offsets come from the str itself, so text that cannot be encoded (lone surrogates) is fine
+    newlines = np.array([match.start() for match in re.finditer("\n", text)], dtype=np.int64)
+    lines = np.searchsorted(newlines, starts)
+
+    # Number of amounts before each token on the same line
+    amounts_before = np.cumsum(~nils) - ~nils
+    first_on_line = np.searchsorted(lines, lines)
+    keep = ~nils | (amounts_before > amounts_before[first_on_line])
+    starts, lines, values = starts[keep], lines[keep], np.array(values, dtype=np.float64)[keep]
+
+    line_starts = np.concatenate(([0], newlines + 1))
+    columns = starts - line_starts[lines]
+    return NumericTokens(values, lines.astype(np.int32), columns.astype(np.int32))
+
+
+def values_by_line(tokens, line_count):
+    """Split the page's values into one array per line."""
+    boundaries = np.searchsorted(tokens.lines, np.arange(1, line_count))
+    return np.split(tokens.values, boundaries)
+
+
+def benchmark(text=None, repeat=200):
+    """Return tokenizer throughput in values per second."""
+    if text is None:
+        row = "Total income 1,23,45,678.90 (1,234.00) 45,678.00 - 12,34,567.00\n"
+        text = row * 500
+    count = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        count += len(tokenize_page(text).values)
+    return count / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    print(f"{benchmark():,.0f} values/sec")
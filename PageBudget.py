@@ -0,0 +1,258 @@
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+from pdfminer.pdftypes import resolve1
+
+import PageStream
+
+# Seconds a single page may take before it is given up on
+PAGE_TIME_BUDGET = 20.0
+# Seconds a whole scan of a document may spend extracting new pages
+DOCUMENT_TIME_BUDGET = 600.0
+# Bytes of extra memory a single page may allocate (enforced where the resource module exists)
+PAGE_MEMORY_BUDGET = 1024 * 1024 * 1024
+# Bytes of extra memory a document's worker may allocate in total; it is replaced once this runs out
+DOCUMENT_MEMORY_BUDGET = 4 * 1024 * 1024 * 1024
+# Run page work in a separate process so a pathological page can be killed
+ISOLATE_PAGES = True
+
+# Outcomes recorded for pages that did not fit their budget
+SLOW = "slow"
+DOWNGRADED = "downgraded"
+SKIPPED = "skipped"
+
+
+def extract_page_text(page):
+    return page.extract_text() or ""
+
+
+def raw_page_text(page):
+    """Cheap fallback: strings shown by text operators, read straight from the content stream.
+
+    No layout analysis is done and only simply-encoded fonts come out readable,
+    but it never parses vector drawings or images.
+    """
+    lines = [""]
+    for stream in page.page_obj.contents or []:
+        data = resolve1(stream).get_data()
+        for token in re.finditer(rb"\((?:\\.|[^\\)])*\)|T\*|\bT[dD]\b|'", data):
+            token = token.group()
+            if token.startswith(b"("):
+                lines[-1] += re.sub(rb"\\(.)", rb"\1", token[1:-1]).decode("latin-1")
+            elif lines[-1]:
+                lines.append("")
+    return "\n".join(line for line in lines if line.strip())
+
+
+def _virtual_memory():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _limit_memory(budget, document_limit):
+    """Cap this process's address space at its current size plus budget, but never above document_limit."""
+    try:
+        import resource
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        limit = min(_virtual_memory() + budget, document_limit)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ImportError, OSError, ValueError):
+        pass
+
+
+def _worker_main(pdf_path, connection, memory_budget, document_budget, streaming, memory_target):
+    """Serve (function, page_number) requests; each reply is (status, result, retire)."""
+    import pdfplumber
+
+    pdf = pdfplumber.open(pdf_path)
+    # Everything the worker allocates from here on counts against the document budget
+    document_limit = _virtual_memory() + document_budget
+    try:
+        while True:
+            try:
+                request = connection.recv()
+            except EOFError:
+                break  # The parent has gone away
+            if request is None:
+                break
+            function, page_number = request
+            _limit_memory(memory_budget, document_limit)
+            try:
+                page = pdf.pages[page_number]
+                result = function(page)
+                if streaming:
+                    page.close()
+                status = "ok"
+            except MemoryError:
+                connection.send(("memory", None, True))
+                break
+            except Exception as e:
+                status, result = "error", repr(e)
+            if streaming:
+                pdf = PageStream.release_memory(pdf, pdf_path, memory_target)
+            if _virtual_memory() + memory_budget > document_limit:
+                PageStream.release_document_objects(pdf)
+            # Retire when another page would not fit; the next request starts a fresh worker
+            retire = _virtual_memory() + memory_budget > document_limit
+            connection.send((status, result, retire))
+            if retire:
+                break
+    finally:
+        pdf.close()
+
+
+# Run in a fresh interpreter: it receives the parent's sys.path and the worker settings over the
+# connection, then imports only this module. The application (spaCy, Tk) is never re-imported and
+# scripts calling the extractors need no __main__ guard.
+_BOOTSTRAP = """
+import sys
+from multiprocessing.connection import Connection
+connection = Connection(int(sys.argv[1]))
+sys.path[:0] = connection.recv()
+import PageBudget
+pdf_path, *settings = connection.recv()
+PageBudget._worker_main(pdf_path, connection, *settings)
+"""
+
+
+class PageWorker:
+    """Runs page functions for one document under time and memory budgets."""
+
+    def __init__(self, pdf_path, isolate=None):
+        self.pdf_path = pdf_path
+        self.isolate = ISOLATE_PAGES if isolate is None else isolate
+        self.process = None
+        self.connection = None
+        self.pdf = None
+        # Set by close(); the document was released and must not be read again
+        self.closed = False
+        # Threads sharing a document share its worker; requests must not interleave
+        self.lock = threading.Lock()
+
+    def start(self):
+        # Settings are passed explicitly; a new interpreter does not see changes made at runtime
+        settings = (self.pdf_path, PAGE_MEMORY_BUDGET, DOCUMENT_MEMORY_BUDGET,
+                    PageStream.STREAMING, PageStream.MEMORY_TARGET)
+        if os.name == "posix":
+            # Never fork: the parent runs Tk and background threads
+            self.connection, child_connection = multiprocessing.Pipe()
+            self.process = subprocess.Popen([sys.executable, "-c", _BOOTSTRAP, str(child_connection.fileno())],
+                                            pass_fds=(child_connection.fileno(),))
+            child_connection.close()
+            self.connection.send(sys.path)
+            self.connection.send(settings)
+        else:
+            context = multiprocessing.get_context("spawn")
+            self.connection, child_connection = context.Pipe()
+            self.process = context.Process(target=_worker_main, args=(settings[0], child_connection, *settings[1:]),
+                                           daemon=True)
+            self.process.start()
+
+    def alive(self):
+        if self.process is None:
+            return False
+        if isinstance(self.process, subprocess.Popen):
+            return self.process.poll() is None
+        return self.process.is_alive()
+
+    def stop(self):
+        """Stop the worker once any request in flight has finished; the next request starts a new one."""
+        with self.lock:
+            self._stop()
+
+    def close(self):
+        """Stop the worker for good; later requests raise instead of starting a new one."""
+        with self.lock:
+            self.closed = True
+            self._stop()
+
+    def _stop(self):
+        if self.pdf is not None:
+            self.pdf.close()
+            self.pdf = None
+        if self.process is not None:
+            if self.alive():
+                self.process.kill()
+            if isinstance(self.process, subprocess.Popen):
+                self.process.wait()
+            else:
+                self.process.join()
+            self.process = None
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def run(self, function, page_number, timeout=None):
+        """Return (status, result); status is "ok", "timeout", "memory" or "error"."""
+        timeout = PAGE_TIME_BUDGET if timeout is None else timeout
+        with self.lock:
+            if self.closed:
+                raise RuntimeError(f"{os.path.basename(self.pdf_path)} was closed while it was being read")
+            if not self.isolate:
+                return self.run_in_process(function, page_number, timeout)
+
+            for _ in range(2):
+                if not self.alive():
+                    self._stop()
+                    self.start()
+                retire = False
+                try:
+                    self.connection.send((function, page_number))
+                    if self.connection.poll(timeout):
+                        status, result, retire = self.connection.recv()
+                    else:
+                        status, result = "timeout", None
+                except (EOFError, OSError):
+                    # The worker died without saying why (ConnectionResetError, BrokenPipeError, killed);
+                    # that says nothing about this page, so it gets one more try on a fresh worker
+                    self._stop()
+                    status, result = "error", "the page worker exited unexpectedly"
+                    continue
+                break
+            if retire or status in ("timeout", "memory"):
+                self._stop()
+            return status, result
+
+    def run_in_process(self, function, page_number, timeout):
+        # Without a worker a slow page cannot be interrupted, only remembered afterwards
+        import pdfplumber
+
+        if self.pdf is None:
+            self.pdf = pdfplumber.open(self.pdf_path)
+        started = time.monotonic()
+        try:
+            page = self.pdf.pages[page_number]
+            result = function(page)
+            if PageStream.STREAMING:
+                page.close()
+        except MemoryError:
+            return "memory", None
+        except Exception as e:
+            return "error", repr(e)
+        finally:
+            if PageStream.STREAMING:
+                self.pdf = PageStream.release_memory(self.pdf, self.pdf_path)
+        if time.monotonic() - started > timeout:
+            return "timeout", result
+        return "ok", result
+
+    def run_with_fallback(self, function, page_number, fallback=None):
+        """Return (result, outcome); outcome is None, SLOW, DOWNGRADED or SKIPPED."""
+        status, result = self.run(function, page_number)
+        if status == "ok":
+            return result, None
+        if status == "timeout" and result is not None:
+            # Finished in process but over budget: keep the result, remember the page
+            return result, SLOW
+        if fallback is not None:
+            status, result = self.run(fallback, page_number)
+            if status == "ok":
+                return result, DOWNGRADED
+        return None, SKIPPED
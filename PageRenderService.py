@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from PIL import Image
+
+from PageTextStore import get_page_store
+
+# Rendering resolution (dpi) for each level of the pyramid
+SCALES = {"thumbnail": 24, "preview": 72, "full": 150}
+# Bytes of decoded pixels kept in memory across all documents
+RENDER_CACHE_BUDGET = 256 * 1024 * 1024
+
+
+def render_page(page, resolution):
+    """Rasterise a page (runs in the page worker)."""
+    return page.to_image(resolution=resolution).original.convert("RGB")
+
+
+def image_size(image):
+    return image.width * image.height * len(image.getbands())
+
+
+class PageRenderService:
+    """Rasterises pages once per scale into an in-memory LRU; nothing touches the filesystem.
+
+    A lower scale is derived by downsampling a larger one that is already
+    cached instead of rasterising the page again.
+    """
+
+    def __init__(self, budget=RENDER_CACHE_BUDGET):
+        self.budget = budget
+        self.images = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def cached(self, key):
+        with self.lock:
+            image = self.images.get(key)
+            if image is not None:
+                self.images.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        with self.lock:
+            if key in self.images:
+                self.total_bytes -= image_size(self.images.pop(key))
+            self.images[key] = image
+            self.total_bytes += image_size(image)
+            # Evict least recently used renders, but always keep the one just added
+            while self.total_bytes > self.budget and len(self.images) > 1:
+                _, evicted = self.images.popitem(last=False)
+                self.total_bytes -= image_size(evicted)
+
+    def render(self, pdf_path, page_number, scale="preview"):
+        """Return a PIL image of the page at the given scale, or None if the page is over budget."""
+        key = (pdf_path, page_number, scale)
+        image = self.cached(key)
+        if image is not None:
+            return image
+
+        resolution = SCALES[scale]
+        for larger, larger_resolution in sorted(SCALES.items(), key=lambda item: item[1]):
+            source = self.cached((pdf_path, page_number, larger)) if larger_resolution > resolution else None
+            if source is not None:
+                ratio = resolution / larger_resolution
+                image = source.resize((max(1, round(source.width * ratio)), max(1, round(source.height * ratio))),
+                                      Image.LANCZOS)
+                break
+        else:
+            page_store = get_page_store(pdf_path)
+            image, outcome = page_store.page_worker.run_with_fallback(
+                partial(render_page, resolution=resolution), page_number)
+            if outcome:
+                page_store.record_page_outcome(page_store.fingerprints()[page_number], outcome)
+                page_store.save()
+            if image is None:
+                return None
+
+        image.info["source"] = (pdf_path, page_number, None)
+        self.put(key, image)
+        return image
+
+    def render_region(self, pdf_path, page_number, bbox, scale="full"):
+        """Crop a region given in PDF points (x0, top, x1, bottom) out of the cached page render."""
+        page_image = self.render(pdf_path, page_number, scale)
+        if page_image is None:
+            return None
+        factor = SCALES[scale] / 72
+        x0, top, x1, bottom = bbox
+        # Images can hang off the page edge; keep the crop inside the render
+        region = page_image.crop((max(0, round(x0 * factor)), max(0, round(top * factor)),
+                                  min(page_image.width, round(x1 * factor)), min(page_image.height, round(bottom * factor))))
+        region.info["source"] = (pdf_path, page_number, tuple(bbox))
+        return region
+
+    def render_source(self, source, scale):
+        """Re-render whatever an earlier image came from (a page or a region) at another scale."""
+        pdf_path, page_number, bbox = source
+        if bbox is None:
+            return self.render(pdf_path, page_number, scale)
+        return self.render_region(pdf_path, page_number, bbox, scale)
+
+    def document_bytes(self, pdf_path):
+        with self.lock:
+            return sum(image_size(image) for key, image in self.images.items() if key[0] == pdf_path)
+
+    def release(self, pdf_path):
+        with self.lock:
+            for key in [key for key in self.images if key[0] == pdf_path]:
+                self.total_bytes -= image_size(self.images.pop(key))
+
+
+render_service = PageRenderService()
@@ -0,0 +1,74 @@
+import gc
+import os
+
+import pdfplumber
+
+# Process pages one at a time and release each page's parsed layout before moving on
+STREAMING = True
+# Peak resident memory target in bytes; None disables the check
+MEMORY_TARGET = None
+
+
+def current_rss():
+    """Resident set size of this process in bytes (0 if it cannot be read)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return 0
+
+
+def release_document_objects(pdf):
+    """Drop pdfminer's cache of parsed PDF objects (fonts, streams, xobjects)."""
+    cached_objs = getattr(pdf.doc, "_cached_objs", None)
+    if cached_objs is not None:
+        cached_objs.clear()
+    gc.collect()
+
+
+def release_memory(pdf, pdf_path, memory_target=None):
+    """Bring the process back under memory_target; return the PDF to continue with.
+
+    The document's object cache is dropped first, and if that is not enough
+    the PDF is closed and opened again.
+    """
+    memory_target = MEMORY_TARGET if memory_target is None else memory_target
+    if memory_target and current_rss() > memory_target:
+        release_document_objects(pdf)
+        if current_rss() > memory_target:
+            pdf.close()
+            pdf = pdfplumber.open(pdf_path)
+    return pdf
+
+
+def iter_pages(pdf_path, start=0, stop=None, streaming=None, memory_target=None):
+    """Yield (page_number, page), releasing each page's cached objects once the caller moves on.
+
+    pdfplumber keeps every parsed character, line and layout object on the
+    Page until it is closed, so walking a long DRHP without closing pages
+    grows memory with document length. When memory_target is set and the
+    process is still above it after a page, the document's object cache is
+    dropped, and if that is not enough the PDF is reopened.
+    """
+    streaming = STREAMING if streaming is None else streaming
+    memory_target = MEMORY_TARGET if memory_target is None else memory_target
+
+    pdf = pdfplumber.open(pdf_path)
+    try:
+        stop = len(pdf.pages) if stop is None else min(stop, len(pdf.pages))
+        for page_number in range(start, stop):
+            page = pdf.pages[page_number]
+            yield page_number, page
+
+            if not streaming:
+                continue
+            page.close()
+            if page_number + 1 < stop:
+                pdf = release_memory(pdf, pdf_path, memory_target)
+    finally:
+        pdf.close()
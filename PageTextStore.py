@@ -0,0 +1,427 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from pdfminer.pdftypes import PDFObjRef, PDFStream, resolve1
+
+from PageStream import iter_pages
+from SingleFlightCache import _Flight
+import PageBudget
+from PageBudget import PageWorker, extract_page_text, raw_page_text
+
+CACHE_DIR_NAME = ".ipo_cache"
+# Bump when extraction logic changes so stored results are recomputed (page texts are kept)
+CACHE_VERSION = 3
+# Bump when page_fingerprint changes; texts keyed by old fingerprints are then dropped too
+FINGERPRINT_VERSION = 2
+
+# One store per document so every extractor shares the same fingerprints and texts
+_stores = {}
+_stores_lock = threading.Lock()
+# Per cache dir: {file name: (mtime, summary)}; summaries hold fingerprints, never page texts
+_summaries = {}
+_summaries_lock = threading.Lock()
+
+
+def _hash_object(obj, digest, memo):
+    """Feed a PDF object into digest: dicts and arrays by value, streams by their raw bytes."""
+    if isinstance(obj, PDFObjRef):
+        # Fonts and XObjects are shared across pages, so each referenced object is hashed once
+        if obj.objid not in memo:
+            memo[obj.objid] = ""  # a reference back into an object being hashed contributes nothing
+            sub_digest = hashlib.sha1()
+            _hash_object(resolve1(obj), sub_digest, memo)
+            memo[obj.objid] = sub_digest.hexdigest()
+        digest.update(memo[obj.objid].encode())
+    elif isinstance(obj, PDFStream):
+        _hash_object(obj.attrs, digest, memo)
+        data = obj.rawdata if obj.rawdata is not None else obj.data
+        digest.update(data or b"")
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=str):
+            digest.update(str(key).encode())
+            _hash_object(obj[key], digest, memo)
+    elif isinstance(obj, (list, tuple)):
+        digest.update(b"[")
+        for item in obj:
+            _hash_object(item, digest, memo)
+        digest.update(b"]")
+    else:
+        digest.update(repr(obj).encode())
+
+
+def page_fingerprint(page, memo=None):
+    """Hash the raw content streams of a page, and the resources they draw, without running layout analysis.
+
+    Pages that only paint an XObject ('q /Fm0 Do Q') have identical content
+    streams, so the fonts and XObjects in /Resources are part of the hash.
+    memo maps object ids to digests and can be shared between pages.
+    """
+    memo = {} if memo is None else memo
+    digest = hashlib.sha1()
+    digest.update(f"{page.width}x{page.height}".encode())
+    for stream in page.page_obj.contents or []:
+        stream = resolve1(stream)
+        try:
+            digest.update(stream.get_data())
+        except Exception:
+            # Unreadable streams still contribute something stable to the hash
+            digest.update(repr(stream).encode())
+    _hash_object(page.page_obj.resources or {}, digest, memo)
+    return digest.hexdigest()
+
+
+def _result_matches(entry, fingerprints):
+    """Whether the pages a stored result was read from are unchanged in a document with these fingerprints."""
+    if entry.get("whole_document"):
+        return entry["fingerprints"] == fingerprints
+    return entry["fingerprints"] == fingerprints[:len(entry["fingerprints"])]
+
+
+def _matching_result(doc, name, fingerprints):
+    """Return the value of a stored result if the pages it was read from are unchanged."""
+    entry = doc.get("results", {}).get(name)
+    if entry and _result_matches(entry, fingerprints):
+        return entry["value"]
+    return None
+
+
+def read_cache_file(path):
+    """Return a cached document, or None if it is missing or unreadable."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            doc = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if doc.get("fingerprint_version") != FINGERPRINT_VERSION:
+        doc.update(fingerprint_version=FINGERPRINT_VERSION, fingerprints=[], texts={}, page_budgets={})
+        doc["version"] = None
+    if doc.get("version") != CACHE_VERSION:
+        doc["version"] = CACHE_VERSION
+        doc["results"] = {}
+    return doc
+
+
+def cache_summaries(cache_dir):
+    """Summarise every cached document in cache_dir as {name: summary}.
+
+    A summary has the document's page fingerprints, the fingerprints it holds
+    text for, and its stored results without their values. Summaries are kept
+    for the life of the process and a file is only read again once it changes.
+    """
+    with _summaries_lock:
+        summaries = _summaries.setdefault(cache_dir, {})
+        file_names = [name for name in os.listdir(cache_dir) if name.endswith(".json")] if os.path.isdir(cache_dir) else []
+        for file_name in set(summaries) - set(file_names):
+            del summaries[file_name]
+        for file_name in file_names:
+            path = os.path.join(cache_dir, file_name)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if file_name in summaries and summaries[file_name][0] == mtime:
+                continue
+            doc = read_cache_file(path)
+            if doc is None:
+                continue
+            summaries[file_name] = (mtime, {
+                "path": path,
+                "fingerprints": doc.get("fingerprints", []),
+                "texts": frozenset(doc.get("texts", {})),
+                "results": {name: {key: value for key, value in entry.items() if key != "value"}
+                            for name, entry in doc.get("results", {}).items()},
+            })
+        return {file_name[:-len(".json")]: summary for file_name, (_, summary) in summaries.items()}
+
+
+class PageTextStore:
+    def __init__(self, pdf_path, cache_dir=None):
+        self.pdf_path = pdf_path
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(pdf_path)), CACHE_DIR_NAME)
+        self.doc_name = os.path.basename(pdf_path)
+        self.cache_file = os.path.join(self.cache_dir, self.doc_name + ".json")
+        self.data = {"version": CACHE_VERSION, "fingerprint_version": FINGERPRINT_VERSION,
+                     "fingerprints": [], "texts": {}, "results": {}, "page_budgets": {}}
+        # Summaries of the other documents in the cache dir (earlier DRHP/RHP versions, addenda),
+        # read on first need; only texts and outcomes of this document's own pages are copied out
+        self._other_docs = None
+        self._shared_texts = {}
+        self._shared_budgets = {}
+        self._fingerprints = None
+        # Background work (e.g. the search index) shares the store with the UI thread
+        self.lock = threading.RLock()
+        # Pages being extracted right now, by fingerprint; concurrent scans wait for them instead
+        self._flights = {}
+        # New pages are extracted under per-page time and memory budgets
+        self.page_worker = PageWorker(pdf_path)
+        # Set once the store is released; a new store owns the cache file from then on
+        self.closed = False
+        # Set when the cache dir cannot be written (e.g. a read-only folder)
+        self.unwritable = False
+        self.load()
+
+    def load(self):
+        """Load this document's cache; other cached documents are read by other_docs when needed."""
+        doc = read_cache_file(self.cache_file)
+        if doc is not None:
+            self.data.update(doc)
+
+    def other_docs(self):
+        """Summaries of every other cached document next to this one, keyed by file name.
+
+        The first call also copies the texts and budget outcomes of this
+        document's pages out of the documents that have them; nothing else of
+        another document is kept in memory.
+        """
+        with self.lock:
+            if self._other_docs is None:
+                summaries = cache_summaries(self.cache_dir)
+                summaries.pop(self.doc_name, None)
+                wanted = set(self.fingerprints())
+                for summary in summaries.values():
+                    if wanted.isdisjoint(summary["texts"]):
+                        continue
+                    doc = read_cache_file(summary["path"]) or {}
+                    for fingerprint in wanted.intersection(doc.get("texts", {})):
+                        self._shared_texts.setdefault(fingerprint, doc["texts"][fingerprint])
+                    for fingerprint in wanted.intersection(doc.get("page_budgets", {})):
+                        self._shared_budgets.setdefault(fingerprint, doc["page_budgets"][fingerprint])
+                self._other_docs = summaries
+            return self._other_docs
+
+    def save(self):
+        """Write the cache file atomically; if it cannot be written the document just stays uncached."""
+        with self.lock:
+            if self.closed or self.unwritable:
+                return
+            temp_path = None
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                # Readers and other processes only ever see a complete file
+                fd, temp_path = tempfile.mkstemp(prefix=self.doc_name + ".", suffix=".tmp", dir=self.cache_dir)
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self.data, f)
+                os.replace(temp_path, self.cache_file)
+            except OSError as e:
+                print(f"Could not write the cache for {self.doc_name} ({e}); continuing without it")
+                self.unwritable = True
+                if temp_path is not None and os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def known_text(self, fingerprint):
+        """Return cached text for a page fingerprint from any cached version."""
+        if fingerprint in self.data["texts"]:
+            return self.data["texts"][fingerprint]
+        self.other_docs()  # Copies this document's pages out of other versions on first use
+        return self._shared_texts.get(fingerprint)
+
+    def extract_page(self, page_number, fingerprint):
+        """Extract a new page's text once, even when several scans reach it at the same time.
+
+        The first scan to ask extracts the page under its budgets; the others
+        wait for that text instead of extracting it again.
+        """
+        with self.lock:
+            if fingerprint in self.data["texts"]:
+                return self.data["texts"][fingerprint]
+            flight = self._flights.get(fingerprint)
+            leader = flight is None
+            if leader:
+                flight = self._flights[fingerprint] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            text, outcome = self.page_worker.run_with_fallback(extract_page_text, page_number, raw_page_text)
+            flight.value = text or ""
+            if outcome:
+                print(f"Page {page_number + 1} exceeded its extraction budget ({outcome})")
+                self.record_page_outcome(fingerprint, outcome)
+            with self.lock:
+                self.data["texts"][fingerprint] = flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self._flights[fingerprint]
+            flight.done.set()
+        return flight.value
+
+    def fingerprints(self):
+        """Fingerprint every page of the document (cheap: no text extraction)."""
+        with self.lock:
+            if self._fingerprints is None:
+                memo = {}
+                self._fingerprints = [page_fingerprint(page, memo) for _, page in iter_pages(self.pdf_path)]
+                self.data["fingerprints"] = self._fingerprints
+            return self._fingerprints
+
+    def iter_page_texts(self):
+        """Return a PageScan yielding (page_number, text) for every page.
+
+        Pages not seen in any cached version are extracted. The scan, not the
+        store, records whether the document budget ran out, so concurrent scans
+        of the same document cannot clear each other's state.
+        """
+        return PageScan(self)
+
+    def record_page_outcome(self, fingerprint, outcome):
+        with self.lock:
+            self.data["page_budgets"][fingerprint] = outcome
+
+    def page_outcome(self, page_number):
+        """Return SLOW/DOWNGRADED/SKIPPED if this page is known to exceed its budget."""
+        fingerprint = self.fingerprints()[page_number]
+        outcome = self.data["page_budgets"].get(fingerprint)
+        if outcome or fingerprint in self.data["texts"]:
+            # Pages this document has already read need no other version
+            return outcome
+        self.other_docs()
+        return self._shared_budgets.get(fingerprint)
+
+    def partial_note(self, budget_exhausted=False):
+        """Describe pages that were not fully read, or "" if the document was read completely.
+
+        budget_exhausted is the exhausted flag of the scan the result came from.
+        """
+        pages = [str(page_number + 1) for page_number in range(len(self.fingerprints()))
+                 if self.page_outcome(page_number) in (PageBudget.DOWNGRADED, PageBudget.SKIPPED)]
+        note = ""
+        if pages:
+            note += f"Note: pages {', '.join(pages)} exceeded the extraction budget and were skipped or read with a simpler method; results may be partial.\n"
+        if budget_exhausted:
+            note += "Note: the document time budget ran out before every page was read; results may be partial.\n"
+        return note
+
+    def cached_result(self, name):
+        """Return a stored result whose source pages are unchanged in this document."""
+        fingerprints = self.fingerprints()
+        value = _matching_result(self.data, name, fingerprints)
+        if value is not None:
+            return value
+        for summary in self.other_docs().values():
+            entry = summary["results"].get(name)
+            if entry and _result_matches(entry, fingerprints):
+                # Only the value found is read back from the other document's cache file
+                value = _matching_result(read_cache_file(summary["path"]) or {}, name, fingerprints)
+                if value is not None:
+                    return value
+        return None
+
+    def store_result(self, name, value, pages_used=None, budget_exhausted=False):
+        """Store a result along with the fingerprints of the pages it was read from.
+
+        pages_used=None means the result depends on every page of the document.
+        budget_exhausted is the exhausted flag of the scan the result was read from.
+        """
+        if budget_exhausted:
+            # Pages were left unread; don't let a partial result outlive this scan
+            return
+        fingerprints = self.fingerprints()
+        with self.lock:
+            self.data["results"][name] = {
+                "fingerprints": fingerprints if pages_used is None else fingerprints[:pages_used],
+                "whole_document": pages_used is None,
+                "value": value,
+            }
+            self.save()
+
+    def close(self):
+        """Stop extracting and saving; threads still holding the store see their next page request fail."""
+        with self.lock:
+            self.closed = True
+        self.page_worker.close()
+
+    def estimated_size(self):
+        """Rough bytes held in memory for this document's page texts, including those taken from other versions."""
+        with self.lock:
+            shared = [text for fingerprint, text in self._shared_texts.items() if fingerprint not in self.data["texts"]]
+            return sum(len(text) for text in self.data["texts"].values()) + sum(len(text) for text in shared)
+
+    def find_previous_version(self):
+        """Return the cached document sharing the most pages with this one, or (None, None).
+
+        Only a document sharing a majority of this document's pages counts as an
+        earlier version; a few common pages (blank or boilerplate) do not.
+        """
+        fingerprints = set(self.fingerprints())
+        best_name, best_summary, best_shared = None, None, len(fingerprints) // 2
+        for name, summary in self.other_docs().items():
+            shared = len(fingerprints.intersection(summary["fingerprints"]))
+            if shared > best_shared:
+                best_name, best_summary, best_shared = name, summary, shared
+        if best_summary is None:
+            return None, None
+        return best_name, read_cache_file(best_summary["path"])
+
+
+class PageScan:
+    """One pass over a document's page texts.
+
+    Pages that blow their time or memory budget are read with the cheap
+    raw-stream backend, or skipped, and remembered so later scans do not
+    try them again. Once the document budget is spent, remaining new pages
+    are yielded as empty text and exhausted is set.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.exhausted = False
+
+    def __iter__(self):
+        store = self.store
+        fingerprints = store.fingerprints()
+        started = time.monotonic()
+        dirty = False
+        try:
+            for page_number, fingerprint in enumerate(fingerprints):
+                text = store.known_text(fingerprint)
+                if text is None:
+                    if time.monotonic() - started > PageBudget.DOCUMENT_TIME_BUDGET:
+                        self.exhausted = True
+                        yield page_number, ""
+                        continue
+                    text = store.extract_page(page_number, fingerprint)
+                    dirty = True
+                with store.lock:
+                    if fingerprint not in store.data["texts"]:
+                        store.data["texts"][fingerprint] = text
+                        dirty = True
+                yield page_number, text
+        finally:
+            if dirty:
+                store.save()
+
+
+def get_page_store(pdf_path):
+    with _stores_lock:
+        if pdf_path not in _stores:
+            _stores[pdf_path] = PageTextStore(pdf_path)
+        return _stores[pdf_path]
+
+
+def loaded_page_store(pdf_path):
+    """Return the store for a document only if it is already in memory."""
+    with _stores_lock:
+        return _stores.get(pdf_path)
+
+
+def release_page_store(pdf_path):
+    """Forget the in-memory store; it is reloaded from .ipo_cache on next use.
+
+    Waits for a page request in flight. Release the search index first so its
+    background build is not cut off mid-scan.
+    """
+    with _stores_lock:
+        store = _stores.pop(pdf_path, None)
+    if store is not None:
+        store.close()
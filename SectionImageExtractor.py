@@ -1,39 +1,62 @@
-import pdfplumber
 import re
 from PIL import Image
+from PageTextStore import get_page_store
+from PageRenderService import render_service
+
+def page_image_boxes(page):
+    # Bounding box of every embedded image, in PDF points
+    return [(image['x0'], image['top'], image['x1'], image['bottom']) for image in page.images]
 
 class SectionImageExtractor:
     def __init__(self, pdf_path):
         self.pdf_path = pdf_path
+        self.page_store = get_page_store(pdf_path)
 
     def find_section_pages(self, section_title, occurrence=2):
+        # Section locations are reused while the pages up to them are unchanged
+        result_name = f"section_page:{section_title}:{occurrence}"
+        cached = self.page_store.cached_result(result_name)
+        if cached is not None:
+            return cached["page"]
+
         count = 0
-        with pdfplumber.open(self.pdf_path) as pdf:
-            for i, page in enumerate(pdf.pages):
-                text = page.extract_text()
-                if text and re.search(section_title, text, re.IGNORECASE):
-                    count += 1
-                    if count == occurrence:
-                        return i + 1  # Return the page number (1-indexed)
-        return None
+        start_page = None
+        pages_used = 0
+        scan = self.page_store.iter_page_texts()
+        for i, text in scan:
+            pages_used = i + 1
+            if text and re.search(section_title, text, re.IGNORECASE):
+                count += 1
+                if count == occurrence:
+                    start_page = i + 1  # Return the page number (1-indexed)
+                    break
+        else:
+            pages_used = None
+        self.page_store.store_result(result_name, {"page": start_page}, pages_used, scan.exhausted)
+        return start_page
 
     def display_images_from_section(self, section_title="SECTION IV: ABOUT OUR COMPANY", occurrence=2, max_pages=5):
         images = []  # List to store extracted images
-        with pdfplumber.open(self.pdf_path) as pdf:
-            start_page = self.find_section_pages(section_title, occurrence)
-            if start_page is None:
-                print("Section not found.")
-                return []
+        start_page = self.find_section_pages(section_title, occurrence)
+        if start_page is None:
+            print("Section not found.")
+            return []
 
-            end_page = min(start_page + max_pages - 1, len(pdf.pages))
-            for i in range(start_page - 1, end_page):
-                page = pdf.pages[i]
-                for image in page.images:
-                    # Extract the bounding box of the image
-                    x0, top, x1, bottom = image['x0'], image['top'], image['x1'], image['bottom']
-                    # Crop the image from the page
-                    cropped_image = page.within_bbox((x0, top, x1, bottom)).to_image()
-                    # Convert cropped image to PIL image and ensure it's in RGB format
-                    pil_image = cropped_image.original.convert("RGB")
-                    images.append(pil_image)  # Append PIL image to the list
+        end_page = min(start_page - 1 + max_pages, len(self.page_store.fingerprints()))
+        for i in range(start_page - 1, end_page):
+            # Pages already known to blow their budget are not rendered again
+            if self.page_store.page_outcome(i):
+                print(f"Skipping page {i + 1}: it exceeded its extraction budget before.")
+                continue
+            boxes, outcome = self.page_store.page_worker.run_with_fallback(page_image_boxes, i)
+            if outcome:
+                print(f"Page {i + 1} exceeded its extraction budget ({outcome})")
+                self.page_store.record_page_outcome(self.page_store.fingerprints()[i], outcome)
+                self.page_store.save()
+                continue
+            for box in boxes:
+                # Crop from the cached page render instead of rasterising each image separately
+                image = render_service.render_region(self.pdf_path, i, box)
+                if image is not None:
+                    images.append(image)  # Append PIL image to the list
         return images  # Return the list of images
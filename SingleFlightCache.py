@@ -0,0 +1,63 @@
+import threading
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlightCache:
+    """Thread-safe cache where concurrent misses for one key share a single computation.
+
+    The first caller for a missing key computes it; everyone else asking for
+    the same key meanwhile waits for that result instead of starting their
+    own. Failures are passed to the waiters and not cached.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.flights = {}
+        self.lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self.lock:
+            if key in self.values:
+                return self.values[key]
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            with self.lock:
+                self.values[key] = flight.value
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.value
+
+    def get(self, key, default=None):
+        with self.lock:
+            return self.values.get(key, default)
+
+    def pop(self, key, default=None):
+        with self.lock:
+            return self.values.pop(key, default)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.values
@@ -0,0 +1,158 @@
+"""Export extracted statements of one or many DRHPs as one columnar table.
+
+Usage:
+    python StatementExport.py OUTPUT PDF [PDF ...] [--format parquet|arrow|csv] [--verbose]
+
+Every value becomes one row of a long table with a fixed schema (see
+COLUMNS), so downstream models read a year of IPOs with a single columnar
+read instead of parsing tabulate grids.
+"""
+import argparse
+import contextlib
+import csv
+import os
+import sys
+
+from FinancialDataExtractor import FinancialDataExtractor
+from AssetsLiabilitiesExtractor import AssetsLiabilitiesExtractor
+from StatementExtractor import StatementExtractor, normalize_label
+from PageTextStore import release_page_store
+
+# Column name and Arrow type, in order. Changing this breaks downstream readers.
+COLUMNS = [
+    ("document", "string"),
+    ("statement", "string"),
+    ("line_item", "string"),
+    ("label_key", "string"),
+    ("period_index", "int32"),
+    ("period", "string"),
+    ("value", "float64"),
+    ("page", "int32"),
+]
+
+FORMATS = {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow", ".csv": "csv"}
+
+
+def add_rows(columns, document, statement, rows, periods=None, pages=None):
+    """Append [label, value, value, ...] rows to the column lists."""
+    for row_index, row in enumerate(rows):
+        label = row[0]
+        for period_index, value in enumerate(row[1:]):
+            if value is None or value == "":
+                continue
+            columns["document"].append(document)
+            columns["statement"].append(statement)
+            columns["line_item"].append(label)
+            columns["label_key"].append(normalize_label(label))
+            columns["period_index"].append(period_index)
+            columns["period"].append(periods[period_index] if periods and period_index < len(periods) else None)
+            columns["value"].append(float(value))
+            columns["page"].append(pages[row_index] if pages else None)
+
+
+def collect_document(pdf_path, columns):
+    document = os.path.basename(pdf_path)
+
+    # Key P&L rows (no period labels are available for these)
+    add_rows(columns, document, "profit_and_loss_summary", FinancialDataExtractor(pdf_path).extract_rows())
+
+    # Balance sheet totals; the D/E ratio row goes to its own statement
+    extractor = AssetsLiabilitiesExtractor(pdf_path)
+    rows = extractor.extract_rows()
+    periods = extractor.headers[1:]
+    add_rows(columns, document, "balance_sheet_summary", [row for row in rows if not row[0].startswith("DOE")], periods)
+    add_rows(columns, document, "ratios", [["Debt/Equity"] + row[1:] for row in rows if row[0].startswith("DOE")], periods)
+
+    # Every line item of the full statements, with their period headers and pages
+    statements = StatementExtractor(pdf_path)
+    statements.extract_statements()
+    for statement, parsed in statements.statements.items():
+        add_rows(columns, document, statement,
+                 [[item["label"]] + item["values"] for item in parsed["items"]],
+                 parsed["periods"], [item["page"] for item in parsed["items"]])
+
+
+def collect_statements(pdf_paths, verbose=False):
+    """Extract every document and return the export as a dict of column lists.
+
+    Progress goes to stderr so stdout stays clean for pipelines. The
+    extractors' own line-by-line output is dropped unless verbose is set,
+    in which case it goes to stderr as well.
+    """
+    columns = {name: [] for name, _ in COLUMNS}
+    for pdf_path in pdf_paths:
+        print(f"Extracting {pdf_path}", file=sys.stderr)
+        with contextlib.ExitStack() as stack:
+            log = sys.stderr if verbose else stack.enter_context(open(os.devnull, "w"))
+            stack.enter_context(contextlib.redirect_stdout(log))
+            try:
+                collect_document(pdf_path, columns)
+            finally:
+                # Stop the document's page worker and drop its texts before moving to the next one
+                release_page_store(pdf_path)
+    return columns
+
+
+def to_arrow_table(columns):
+    import pyarrow as pa
+
+    schema = pa.schema([(name, getattr(pa, arrow_type)()) for name, arrow_type in COLUMNS])
+    return pa.table(columns, schema=schema)
+
+
+def resolve_format(output_path, file_format=None):
+    """The explicit format, else the one implied by the extension (Parquet by default)."""
+    return file_format or FORMATS.get(os.path.splitext(output_path)[1].lower(), "parquet")
+
+
+def write_columns(columns, output_path, file_format=None):
+    file_format = resolve_format(output_path, file_format)
+    if file_format == "csv":
+        names = [name for name, _ in COLUMNS]
+        with open(output_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(names)
+            writer.writerows(zip(*(columns[name] for name in names)))
+        return
+
+    try:
+        table = to_arrow_table(columns)
+    except ImportError:
+        raise RuntimeError("Arrow and Parquet export need pyarrow (pip install pyarrow); use .csv otherwise.")
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, output_path)
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(table, output_path)
+
+
+def export_statements(pdf_paths, output_path, file_format=None, verbose=False):
+    """Extract statements from pdf_paths and write them to output_path in one bulk write."""
+    columns = collect_statements(pdf_paths, verbose)
+    write_columns(columns, output_path, file_format)
+    return len(columns["value"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export extracted DRHP statements to Parquet, Arrow or CSV.")
+    parser.add_argument("output", help="output file (.parquet, .arrow/.feather or .csv)")
+    parser.add_argument("pdfs", nargs="+", help="DRHP/RHP PDF files")
+    parser.add_argument("--format", choices=["parquet", "arrow", "csv"], help="override the format implied by the extension")
+    parser.add_argument("--verbose", action="store_true", help="show the extractors' progress on stderr")
+    args = parser.parse_args()
+
+    # Fail before spending minutes on extraction if the output cannot be written
+    file_format = resolve_format(args.output, args.format)
+    if file_format != "csv":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error(f"{file_format} output needs pyarrow (pip install pyarrow); use a .csv output or --format csv otherwise")
+
+    count = export_statements(args.pdfs, args.output, file_format, args.verbose)
+    print(f"Wrote {count} values to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
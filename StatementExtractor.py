@@ -0,0 +1,213 @@
+import re
+
+from PageTextStore import get_page_store
+from NumberTokenizer import parse_amount, tokenize_page
+
+# How each statement is recognised, and the line that tells us it has ended
+STATEMENTS = {
+    "profit_and_loss": {
+        "headers": ["statement of profit and loss", "statement of profit & loss", "profit and loss statement"],
+        "end": ["per equity share", "earnings per share"],
+    },
+    "balance_sheet": {
+        "headers": ["balance sheet", "statement of assets and liabilities"],
+        "end": ["total equity and liabilities"],
+    },
+    "cash_flow": {
+        "headers": ["statement of cash flows", "statement of cash flow", "cash flow statement"],
+        "end": ["cash and cash equivalents at the end"],
+    },
+}
+
+# Column header lines name periods: 'As at March 31, 2023', 'Year ended 31.03.2022', 'FY 2021'
+HEADER_PATTERN = re.compile(
+    r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\b"
+    r"|\b(?:as at|ended|fy)\b"
+    r"|(?<![\d.,])(?:19|20)\d{2}(?![\d.,]\d)",
+    re.IGNORECASE)
+# A note reference is a small number such as 27, 3.1 or 12.10
+NOTE_PATTERN = re.compile(r"\d{1,2}(?:\.\d{1,2})?")
+
+
+def extract_page_words(page):
+    """Words with their horizontal extent and vertical position (runs in the page worker)."""
+    return [(word["text"], word["x0"], word["x1"], word["top"]) for word in page.extract_words()]
+
+
+def normalize_label(label):
+    """Normalise a line item label so 'Finance Costs (Note 27)' and 'finance costs' match."""
+    label = label.lower().replace("&", "and")
+    label = re.sub(r"\(\s*[ivx]+(?:\s*[-+=]\s*[ivx]+)*\s*\)", " ", label)  # (I+II), (III-IV)
+    label = re.sub(r"\(\s*notes?\b[^)]*\)", " ", label)                       # (Note 27), (Notes 3 and 4)
+    label = re.sub(r"\bnotes?\s*(?:no\.?\s*)?[\d.]+(?:\s*(?:,|and)\s*[\d.]+)*\s*$", " ", label)  # trailing Note 27
+    label = re.sub(r"^\s*\(?(?:[a-h]|[ivx]+|\d+)[.)]\s+", "", label)      # a) / (ii) / 1.
+    label = re.sub(r"[^a-z0-9 ]+", " ", label)
+    return " ".join(label.split())
+
+
+class StatementExtractor:
+    def __init__(self, pdf_path, column_gap=20, line_tolerance=3, min_values=20):
+        self.pdf_path = pdf_path
+        self.page_store = get_page_store(pdf_path)
+        # Right edges of numbers further apart than this belong to different period columns
+        self.column_gap = column_gap
+        # Words whose tops are this close are on the same line
+        self.line_tolerance = line_tolerance
+        # A statement page has plenty of numbers; this skips the table of contents
+        self.min_values = min_values
+        self.statements = {}
+        self.index = {}
+        # Set when the scan behind locate_statements() ran out of document time
+        self.budget_exhausted = False
+
+    def locate_statements(self):
+        """Return {statement: [page_number, ...]} using the cached page texts."""
+        pages = {}
+        scan = self.page_store.iter_page_texts()
+        texts = [text for _, text in scan]
+        self.budget_exhausted = scan.exhausted
+        for page_number, text in enumerate(texts):
+            lower = text.lower()
+            for statement, markers in STATEMENTS.items():
+                if statement in pages or not any(header in lower for header in markers["headers"]):
+                    continue
+                if len(tokenize_page(text).values) < self.min_values:
+                    continue
+                pages[statement] = [page_number]
+                # Statements that do not finish on their first page continue on the next
+                if not any(end in lower for end in markers["end"]) and page_number + 1 < len(texts):
+                    pages[statement].append(page_number + 1)
+        return pages
+
+    def group_lines(self, words):
+        lines = []
+        for word in sorted(words, key=lambda word: (word[3], word[1])):
+            if lines and abs(word[3] - lines[-1][0]) <= self.line_tolerance:
+                lines[-1][1].append(word)
+            else:
+                lines.append([word[3], [word]])
+        return [sorted(line_words, key=lambda word: word[1]) for _, line_words in lines]
+
+    def split_line(self, line_words):
+        """Split a line into its label and the (word, value) pairs to the right of it."""
+        values = []
+        for word in reversed(line_words):
+            value = parse_amount(word[0])
+            if value is None:
+                break
+            values.append((word, value))
+        values.reverse()
+        label = " ".join(word[0] for word in line_words[:len(line_words) - len(values)])
+        return label, values
+
+    def find_columns(self, value_words):
+        """Cluster the right edges of numbers into period columns."""
+        edges = sorted(word[2] for word in value_words)
+        clusters = []
+        for edge in edges:
+            if clusters and edge - clusters[-1][-1] <= self.column_gap:
+                clusters[-1].append(edge)
+            else:
+                clusters.append([edge])
+        return [(min(cluster), max(cluster)) for cluster in clusters]
+
+    def column_headers(self, lines, columns, first_value_top):
+        """Join the header words sitting above each column."""
+        headers = [[] for _ in columns]
+        for line_words in lines:
+            if line_words[0][3] >= first_value_top:
+                break
+            for word in line_words:
+                for i, (left, right) in enumerate(columns):
+                    if word[2] >= left - self.column_gap * 3 and word[2] <= right + self.column_gap:
+                        headers[i].append(word[0])
+                        break
+        return [" ".join(header) for header in headers]
+
+    def parse_statement(self, page_numbers):
+        lines = []
+        for page_number in page_numbers:
+            words, outcome = self.page_store.page_worker.run_with_fallback(extract_page_words, page_number)
+            if outcome:
+                self.page_store.record_page_outcome(self.page_store.fingerprints()[page_number], outcome)
+            lines.extend((page_number, line) for line in self.group_lines(words or []))
+
+        rows = []
+        pending_label = ""
+        header_page = None
+        for page_number, line_words in lines:
+            label, values = self.split_line(line_words)
+            if values and not label:
+                # Unlabelled numbers are the year line of the column headers
+                continue
+            if page_number != header_page and HEADER_PATTERN.search(" ".join(word[0] for word in line_words)):
+                # Above a page's first line item, lines naming dates or years are column headers,
+                # even when they end in something that parses as an amount ('March 31, 2022')
+                continue
+            if values:
+                header_page = page_number
+            if not values:
+                # A label wrapped onto the next line keeps its first half
+                pending_label = label
+                continue
+            if pending_label and label[:1].islower():
+                label = pending_label + " " + label
+            pending_label = ""
+            rows.append((page_number, label, values))
+
+        value_words = [word for _, _, values in rows for word, _ in values]
+        if not value_words:
+            return {"pages": [p + 1 for p in page_numbers], "periods": [], "items": []}
+        columns = self.find_columns(value_words)
+        first_value_top = min(word[3] for word, _ in rows[0][2])
+        headers = self.column_headers([line for page, line in lines if page == rows[0][0]], columns, first_value_top)
+
+        aligned_rows = []
+        for page_number, label, values in rows:
+            aligned = [None] * len(columns)
+            for word, value in values:
+                nearest = min(range(len(columns)),
+                              key=lambda i: 0 if columns[i][0] <= word[2] <= columns[i][1]
+                              else min(abs(word[2] - columns[i][0]), abs(word[2] - columns[i][1])))
+                aligned[nearest] = word[0], value
+            aligned_rows.append((page_number, label, aligned))
+
+        # The notes column sits left of the period columns and holds small references like '27'
+        keep = list(range(len(columns)))
+        note_words = [aligned[0][0] for _, _, aligned in aligned_rows if aligned[0] is not None]
+        if len(columns) > 1 and note_words and all(NOTE_PATTERN.fullmatch(word) for word in note_words):
+            keep = keep[1:]
+        items = []
+        for page_number, label, aligned in aligned_rows:
+            values = [aligned[i][1] if aligned[i] is not None else None for i in keep]
+            items.append({"label": label, "page": page_number + 1, "values": values})
+        return {"pages": [p + 1 for p in page_numbers], "periods": [headers[i] for i in keep], "items": items}
+
+    def extract_statements(self):
+        """Parse every located statement once and index all line items by normalised label."""
+        cached = self.page_store.cached_result("statements")
+        if cached is None:
+            cached = {statement: self.parse_statement(pages)
+                      for statement, pages in self.locate_statements().items()}
+            self.page_store.store_result("statements", cached, budget_exhausted=self.budget_exhausted)
+        self.statements = cached
+
+        self.index = {}
+        for statement, parsed in self.statements.items():
+            for item in parsed["items"]:
+                key = normalize_label(item["label"])
+                if key and key not in self.index:
+                    self.index[key] = dict(item, statement=statement, periods=parsed["periods"])
+        return self.index
+
+    def find_line_items(self, question, limit=3):
+        """Line items whose label appears in the question, longest (most specific) first."""
+        normalized = normalize_label(question)
+        if normalized in self.index:
+            return [self.index[normalized]]
+        padded = f" {normalized} "
+        # Very short labels ('tax', 'total') would match almost any question
+        matches = sorted((key for key in self.index if len(key) > 3 and f" {key} " in padded),
+                         key=len, reverse=True)
+        return [self.index[key] for key in matches[:limit]]
+
@@ -1,7 +1,8 @@
+import os
+import queue
 import tkinter as tk
 from tkinter import Label, Toplevel
 from PIL import Image, ImageTk
-import pdfplumber
 import pandas as pd
 import spacy
 from sklearn.feature_extraction.text import TfidfVectorizer
@@ -10,6 +11,13 @@ from sklearn.metrics.pairwise import cosine_similarity
 from FinancialDataExtractor import *
 from AssetsLiabilitiesExtractor import *
 from SectionImageExtractor import *
+from PageTextStore import get_page_store, loaded_page_store, release_page_store
+from DocumentSearchIndex import start_search_index, search_document, release_search_index, search_index_size
+from MetricGraph import MetricGraph
+from DocumentSession import DocumentSession
+from SingleFlightCache import SingleFlightCache
+from StatementExtractor import StatementExtractor
+from PageRenderService import render_service
 
 import tkinter as tk
 from tkinter import filedialog
@@ -17,62 +25,121 @@ from tkinter import filedialog
 # Load NLP model
 nlp = spacy.load("en_core_web_sm")
 
-# Initialize caches
-financial_data_cache = {}
-assets_liabilities_cache = {}
-ratios_cache = {}
-section_images_cache = {}
-first_page_cache = None
+# Initialize caches; concurrent questions about one document share a single extraction
+financial_data_cache = SingleFlightCache()
+assets_liabilities_cache = SingleFlightCache()
+ratios_cache = SingleFlightCache()
+section_images_cache = SingleFlightCache()
+metric_graphs = SingleFlightCache()
+statements_cache = SingleFlightCache()
 
 def extract_financial_data(pdf_path):
-    if pdf_path in financial_data_cache:
-        return financial_data_cache[pdf_path]
-    
-    extractor = FinancialDataExtractor(pdf_path)
-    data = extractor.extract_financial_data()
-    financial_data_cache[pdf_path] = data  # Cache the data
-    return data
+    return financial_data_cache.get_or_compute(
+        pdf_path, lambda: FinancialDataExtractor(pdf_path).extract_financial_data())
 
 def extract_assets_liabilities(pdf_path):
-    if pdf_path in assets_liabilities_cache:
-        return assets_liabilities_cache[pdf_path]
-    
-    extractor = AssetsLiabilitiesExtractor(pdf_path)
-    data = extractor.extract_assets_liabilities()
-    assets_liabilities_cache[pdf_path] = data  # Cache the data
-    return data
+    return assets_liabilities_cache.get_or_compute(
+        pdf_path, lambda: AssetsLiabilitiesExtractor(pdf_path).extract_assets_liabilities())
+
+def get_statements(pdf_path):
+    """Full P&L, balance sheet and cash flow statements, indexed by line item"""
+    def extract():
+        extractor = StatementExtractor(pdf_path)
+        extractor.extract_statements()
+        return extractor
+    return statements_cache.get_or_compute(pdf_path, extract)
+
+def extracted_statements(pdf_path):
+    """Statements that are already extracted in memory or in the page cache, else None"""
+    statements = statements_cache.get(pdf_path)
+    if statements is None and get_page_store(pdf_path).cached_result("statements") is not None:
+        statements = get_statements(pdf_path)
+    return statements
+
+def answer_line_item(pdf_path, question):
+    """Answer a question naming a statement line item, or return None if none is named"""
+    # Extracting statements takes a full scan; free-form questions must not wait for one
+    statements = extracted_statements(pdf_path)
+    if statements is None:
+        return None
+    items = statements.find_line_items(question)
+    if not items:
+        return None
 
-def extract_and_calculate_ratios(pdf_path):
-    if pdf_path in ratios_cache:
-        return ratios_cache[pdf_path]
-    
-    # Assuming you perform calculations based on the PDF content
-    # Replace with actual calculations
-    result = "Debt-to-equity ratio calculated successfully from the PDF."
-    ratios_cache[pdf_path] = result  # Cache the result
+    result = ""
+    for item in items:
+        statement = item['statement'].replace('_', ' ').title()
+        result += f"{item['label']} ({statement}, page {item['page']}):\n"
+        for i, value in enumerate(item['values']):
+            period = item['periods'][i] if i < len(item['periods']) and item['periods'][i] else f"Period {i+1}"
+            result += f"{period}: {format_currency(value) if value is not None else 'n/a'}\n"
+        result += "\n"
+    return result
+
+def calculate_debt_to_equity(pdf_path):
+    ratios = get_metric_graph(pdf_path).get('debt_to_equity')
+    if not ratios:
+        return "Could not find Total Liabilities and Total Equity to calculate the Debt-to-Equity ratio."
+
+    result = "Debt-to-Equity Ratio Analysis:\n\n"
+    for i, ratio in enumerate(ratios):
+        result += f"Period {i+1}: {ratio:.2f}\n"
     return result
 
+def extract_and_calculate_ratios(pdf_path):
+    return ratios_cache.get_or_compute(pdf_path, lambda: calculate_debt_to_equity(pdf_path))
+
 def display_images_from_section(pdf_path):
-    if pdf_path in section_images_cache:
-        return section_images_cache[pdf_path]
-    
-    extractor = SectionImageExtractor(pdf_path)
-    images = extractor.display_images_from_section()
-    section_images_cache[pdf_path] = images  # Cache the images
-    return images
+    return section_images_cache.get_or_compute(
+        pdf_path, lambda: SectionImageExtractor(pdf_path).display_images_from_section())
 
 def display_first_page(pdf_path):
-    global first_page_cache
-    if first_page_cache is not None:
-        return [first_page_cache]  # Return cached image
-    
-    with pdfplumber.open(pdf_path) as pdf:
-        first_page = pdf.pages[0]
-        image = first_page.to_image()
-        image_path = "first_page.png"  # Save the image temporarily
-        image.save(image_path)
-        first_page_cache = image_path  # Cache the image path
-    return [image_path]  # Return as a list to maintain consistent handling
+    # Rendered once into the in-memory render cache; return as a list to maintain consistent handling
+    image = render_service.render(pdf_path, 0, "preview")
+    return [image] if image is not None else "The first page could not be rendered."
+
+def estimate_document_memory(pdf_path):
+    """Rough bytes of cached state held for one document"""
+    size = 0
+    for cache in (financial_data_cache, assets_liabilities_cache, ratios_cache):
+        size += len(cache.get(pdf_path, ""))
+    for image in section_images_cache.get(pdf_path, []):
+        size += image.width * image.height * len(image.getbands())
+    size += render_service.document_bytes(pdf_path)
+    store = loaded_page_store(pdf_path)
+    if store is not None:
+        size += store.estimated_size()
+    size += search_index_size(pdf_path)
+    return size
+
+def release_document_state(pdf_path):
+    """Drop the heavy in-memory state for a document; everything is rebuilt or reloaded on demand"""
+    for cache in (financial_data_cache, assets_liabilities_cache, ratios_cache,
+                  section_images_cache, metric_graphs, statements_cache):
+        cache.pop(pdf_path, None)
+    render_service.release(pdf_path)
+    # The index build reads through the page store, so it is stopped first
+    release_search_index(pdf_path)
+    release_page_store(pdf_path)
+
+def reload_document(pdf_path):
+    """Re-read a document that may have changed on disk.
+
+    Runs on the document's worker, after any questions already queued for it.
+    Unchanged pages are reused from .ipo_cache; the metric graph is kept and
+    only recomputes metrics whose extracted tables actually changed.
+    """
+    for cache in (financial_data_cache, assets_liabilities_cache, ratios_cache,
+                  section_images_cache, statements_cache):
+        cache.pop(pdf_path, None)
+    render_service.release(pdf_path)
+    release_search_index(pdf_path)
+    release_page_store(pdf_path)
+    graph = metric_graphs.get(pdf_path)
+    if graph is not None:
+        graph.invalidate('financial_table')
+        graph.invalidate('balance_sheet_table')
+    start_search_index(pdf_path)
 
 
 
@@ -84,18 +151,25 @@ def calculate_percentage_change(current, previous):
         return 0
     return ((current - previous) / abs(previous)) * 100
 
-def format_analysis_section(metric_name, values, include_negative=False):
+def growth_series(values):
+    """Percentage change of each period over the one after it"""
+    return [calculate_percentage_change(values[i], values[i+1]) for i in range(len(values)-1)]
+
+def format_analysis_section(metric_name, values, include_negative=False, changes=None):
     """Format the analysis for a single metric"""
     if not values or len(values) < 2:
         return f"Insufficient data for {metric_name} analysis.\n"
         
+    if changes is None:
+        changes = growth_series(values)
+
     result = f"{metric_name} Analysis:\n\n"
     
     for i in range(len(values)-1):
         current_value = values[i]
         previous_value = values[i+1]
         
-        pct_change = calculate_percentage_change(current_value, previous_value)
+        pct_change = changes[i]
         
         result += f"Period {i+1}:\n"
         result += f"Current Value: ₹{current_value:,.2f}\n"
@@ -117,217 +191,103 @@ def format_analysis_section(metric_name, values, include_negative=False):
 
 def analyze_total_income(pdf_path):
     """Analyze only total income metrics"""
-    extractor = FinancialDataExtractor(pdf_path)
-    table_data = extractor.extract_financial_data()
-    parsed_data = parse_tabulated_data(table_data)
+    graph = get_metric_graph(pdf_path)
+    parsed_data = graph.get('financial_metrics')
     
     if not parsed_data or 'total income' not in parsed_data:
         return "No total income data found in the document."
         
-    return format_analysis_section('Total Income', parsed_data['total income'])
+    return format_analysis_section('Total Income', parsed_data['total income']['values'],
+                                   changes=graph.get('growth:total income'))
 
 def analyze_expenses(pdf_path):
     """Analyze only expenses metrics"""
-    extractor = FinancialDataExtractor(pdf_path)
-    table_data = extractor.extract_financial_data()
-    parsed_data = parse_tabulated_data(table_data)
+    graph = get_metric_graph(pdf_path)
+    parsed_data = graph.get('financial_metrics')
     
     if not parsed_data or 'total expenses' not in parsed_data:
         return "No expenses data found in the document."
         
-    return format_analysis_section('Total Expenses', parsed_data['total expenses'])
+    return format_analysis_section('Total Expenses', parsed_data['total expenses']['values'],
+                                   changes=graph.get('growth:total expenses'))
 
 def analyze_comprehensive_loss(pdf_path):
     """Analyze only comprehensive loss metrics"""
-    extractor = FinancialDataExtractor(pdf_path)
-    table_data = extractor.extract_financial_data()
-    parsed_data = parse_tabulated_data(table_data)
+    graph = get_metric_graph(pdf_path)
+    parsed_data = graph.get('financial_metrics')
     
     if not parsed_data or 'comprehensive loss' not in parsed_data:
         return "No comprehensive loss data found in the document."
         
-    return format_analysis_section('Comprehensive Loss', parsed_data['comprehensive loss'])
+    return format_analysis_section('Comprehensive Loss', parsed_data['comprehensive loss']['values'],
+                                   changes=graph.get('growth:comprehensive loss'))
 
 def analyze_loss_per_share(pdf_path):
     """Analyze only loss per share metrics"""
-    extractor = FinancialDataExtractor(pdf_path)
-    table_data = extractor.extract_financial_data()
-    parsed_data = parse_tabulated_data(table_data)
+    graph = get_metric_graph(pdf_path)
+    parsed_data = graph.get('financial_metrics')
     
     if not parsed_data or 'loss per equity share' not in parsed_data:
         return "No loss per share data found in the document."
         
-    return format_analysis_section('Loss per Share', parsed_data['loss per equity share'])
+    return format_analysis_section('Loss per Share', parsed_data['loss per equity share']['values'],
+                                   changes=graph.get('growth:loss per equity share'))
 
 
 
 def analyze_assets(pdf_path):
-    # Get assets and liabilities data
-    data = extract_assets_liabilities(pdf_path)
-    
-    # Split the data into lines
-    lines = data.split('\n')
-    
-    # Find the Total Assets line
-    assets_values = None
-    for line in lines:
-        if 'Total   | assets' in line and 'current' not in line:
-            parts = line.split('|')
-            values = []
-            for part in parts[3:]:  # Skip the first 3 columns which are headers
-                try:
-                    cleaned_val = part.strip().replace(',', '')  # Remove commas
-                    if cleaned_val and not cleaned_val.isalpha():
-                        values.append(float(cleaned_val))
-                except ValueError:
-                    continue
-            assets_values = values
-            break
-    
-    if not assets_values:
+    """Analyze only total assets"""
+    graph = get_metric_graph(pdf_path)
+    metrics = graph.get('balance_sheet_metrics')
+
+    if not metrics or 'total assets' not in metrics:
         return "Could not find Total Assets data in the document."
-    
-    # Calculate percentage changes
-    changes = []
-    for i in range(len(assets_values)-1):
-        current_value = assets_values[i]
-        previous_value = assets_values[i+1]
-        
-        # Calculate percentage change
-        pct_change = ((current_value - previous_value) / previous_value) * 100
-        
-        changes.append({
-            'Current Period Value': current_value,
-            'Previous Period Value': previous_value,
-            'Percentage Change': round(pct_change, 2)
-        })
-    
-    # Create formatted output string
-    result = "Total Assets Analysis:\n\n"
-    for i, change in enumerate(changes):
-        result += f"Period {i+1}:\n"
-        result += f"Current Value: ₹{change['Current Period Value']:,.2f}\n"
-        result += f"Previous Value: ₹{change['Previous Period Value']:,.2f}\n"
-        if change['Percentage Change'] > 0:
-            result += f"Percentage Increase: {abs(change['Percentage Change'])}%\n"
-        else:
-            result += f"Percentage Decrease: {abs(change['Percentage Change'])}%\n"
-        result += "\n"
-    
-    return result
+
+    return format_analysis_section('Total Assets', metrics['total assets']['values'],
+                                   changes=graph.get('growth:total assets'))
 
 def analyze_liabilities(pdf_path):
-    # Get assets and liabilities data
-    data = extract_assets_liabilities(pdf_path)
-    
-    # Split the data into lines
-    lines = data.split('\n')
-    
-    # Find the Total Liabilities line
-    liabilities_values = None
-    for line in lines:
-        if 'Total   | liabilities' in line:
-            parts = line.split('|')
-            values = []
-            for part in parts[3:]:  # Skip the first 3 columns which are headers
-                try:
-                    cleaned_val = part.strip().replace(',', '')  # Remove commas
-                    if cleaned_val and not cleaned_val.isalpha():
-                        values.append(float(cleaned_val))
-                except ValueError:
-                    continue
-            liabilities_values = values
-            break
-    
-    if not liabilities_values:
+    """Analyze only total liabilities"""
+    graph = get_metric_graph(pdf_path)
+    metrics = graph.get('balance_sheet_metrics')
+
+    if not metrics or 'total liabilities' not in metrics:
         return "Could not find Total Liabilities data in the document."
-    
-    # Calculate percentage changes
-    changes = []
-    for i in range(len(liabilities_values)-1):
-        current_value = liabilities_values[i]
-        previous_value = liabilities_values[i+1]
-        
-        # Calculate percentage change
-        pct_change = ((current_value - previous_value) / previous_value) * 100
-        
-        changes.append({
-            'Current Period Value': current_value,
-            'Previous Period Value': previous_value,
-            'Percentage Change': round(pct_change, 2)
-        })
-    
-    # Create formatted output string
-    result = "Total Liabilities Analysis:\n\n"
-    for i, change in enumerate(changes):
-        result += f"Period {i+1}:\n"
-        result += f"Current Value: ₹{change['Current Period Value']:,.2f}\n"
-        result += f"Previous Value: ₹{change['Previous Period Value']:,.2f}\n"
-        if change['Percentage Change'] > 0:
-            result += f"Percentage Increase: {abs(change['Percentage Change'])}%\n"
-        else:
-            result += f"Percentage Decrease: {abs(change['Percentage Change'])}%\n"
-        result += "\n"
-    
-    return result
+
+    return format_analysis_section('Total Liabilities', metrics['total liabilities']['values'],
+                                   changes=graph.get('growth:total liabilities'))
 
 def analyze_assets_liabilities_ratio(pdf_path):
-    # Get assets and liabilities data
-    data = extract_assets_liabilities(pdf_path)
-    
-    # Split the data into lines
-    lines = data.split('\n')
-    
-    # Find both Total Assets and Total Liabilities
-    assets_values = None
-    liabilities_values = None
-    
-    for line in lines:
-        if 'Total   | assets' in line and 'current' not in line:
-            parts = line.split('|')
-            assets_values = []
-            for part in parts[3:]:  # Skip the first 3 columns which are headers
-                try:
-                    cleaned_val = part.strip().replace(',', '')  # Remove commas
-                    if cleaned_val and not cleaned_val.isalpha():
-                        assets_values.append(float(cleaned_val))
-                except ValueError:
-                    continue
-        
-        if 'Total   | liabilities' in line:
-            parts = line.split('|')
-            liabilities_values = []
-            for part in parts[3:]:  # Skip the first 3 columns which are headers
-                try:
-                    cleaned_val = part.strip().replace(',', '')  # Remove commas
-                    if cleaned_val and not cleaned_val.isalpha():
-                        liabilities_values.append(float(cleaned_val))
-                except ValueError:
-                    continue
-    
-    if not assets_values or not liabilities_values:
+    """Analyze the assets to liabilities ratio and how it moves between periods"""
+    graph = get_metric_graph(pdf_path)
+    metrics = graph.get('balance_sheet_metrics')
+
+    if not metrics or 'total assets' not in metrics or 'total liabilities' not in metrics:
         return "Could not find either Assets or Liabilities data in the document."
-    
-    # Calculate ratios and changes
+
+    assets_values = metrics['total assets']['values']
+    liabilities_values = metrics['total liabilities']['values']
+    ratios = graph.get('assets_to_liabilities_ratio')
+
     result = "Assets to Liabilities Ratio Analysis:\n\n"
-    
-    for i in range(len(assets_values)):
-        ratio = assets_values[i] / liabilities_values[i]
+    for i, ratio in enumerate(ratios):
         result += f"Period {i+1}:\n"
         result += f"Assets: ₹{assets_values[i]:,.2f}\n"
         result += f"Liabilities: ₹{liabilities_values[i]:,.2f}\n"
+        if ratio is None:
+            result += "Assets to Liabilities Ratio: n/a (no liabilities)\n\n"
+            continue
         result += f"Assets to Liabilities Ratio: {ratio:.2f}\n"
-        
+
         # Calculate ratio change if not the first period
-        if i > 0:
-            previous_ratio = assets_values[i-1] / liabilities_values[i-1]
-            ratio_change = ((ratio - previous_ratio) / previous_ratio) * 100
+        if i > 0 and ratios[i-1]:
+            ratio_change = ((ratio - ratios[i-1]) / ratios[i-1]) * 100
             if ratio_change > 0:
                 result += f"Ratio Increased by: {abs(ratio_change):.2f}%\n"
             else:
                 result += f"Ratio Decreased by: {abs(ratio_change):.2f}%\n"
         result += "\n"
-    
+
     return result
 
 def parse_tabulated_data(table_string):
@@ -434,15 +394,9 @@ def analyze_metric(metric_name, metric_data, include_headers=True):
 def analyze_all_metrics(pdf_path):
     """Comprehensive analysis of all financial metrics"""
     # Get both financial and balance sheet data
-    financial_extractor = FinancialDataExtractor(pdf_path)
-    balance_sheet_extractor = AssetsLiabilitiesExtractor(pdf_path)
-    
-    financial_data = financial_extractor.extract_financial_data()
-    balance_sheet_data = balance_sheet_extractor.extract_assets_liabilities()
-    
-    # Parse both datasets
-    financial_metrics = parse_tabulated_data(financial_data)
-    balance_sheet_metrics = parse_tabulated_data(balance_sheet_data)
+    graph = get_metric_graph(pdf_path)
+    financial_metrics = graph.get('financial_metrics')
+    balance_sheet_metrics = graph.get('balance_sheet_metrics')
     
     if not financial_metrics and not balance_sheet_metrics:
         return "No financial data could be extracted from the document."
@@ -472,22 +426,16 @@ def analyze_all_metrics(pdf_path):
             analysis += "\nKEY RATIOS\n"
             analysis += "----------\n"
             
-            assets = balance_sheet_metrics['total assets']['values']
-            liabilities = balance_sheet_metrics['total liabilities']['values']
-            
-            for i in range(len(assets)):
-                if liabilities[i] != 0:
-                    ratio = assets[i] / liabilities[i]
+            for i, ratio in enumerate(graph.get('assets_to_liabilities_ratio')):
+                if ratio is not None:
                     analysis += f"Assets to Liabilities Ratio (Period {i+1}): {ratio:.2f}\n"
     
     return analysis
 
 def analyze_all_balance_sheet_metrics(pdf_path):
     """Focused analysis of balance sheet metrics"""
-    extractor = AssetsLiabilitiesExtractor(pdf_path)
-    data = extractor.extract_assets_liabilities()
-    
-    metrics = parse_tabulated_data(data)
+    graph = get_metric_graph(pdf_path)
+    metrics = graph.get('balance_sheet_metrics')
     if not metrics:
         return "No balance sheet data could be extracted from the document."
     
@@ -505,16 +453,14 @@ def analyze_all_balance_sheet_metrics(pdf_path):
         analysis += "FINANCIAL RATIOS\n"
         analysis += "===============\n\n"
         
-        assets = metrics['total assets']['values']
-        liabilities = metrics['total liabilities']['values']
+        ratios = graph.get('assets_to_liabilities_ratio')
         
-        for i in range(len(assets)):
-            if liabilities[i] != 0:
-                current_ratio = assets[i] / liabilities[i]
+        for i, current_ratio in enumerate(ratios):
+            if current_ratio is not None:
                 analysis += f"Assets to Liabilities Ratio (Period {i+1}): {current_ratio:.2f}\n"
                 
-                if i > 0 and liabilities[i-1] != 0:
-                    prev_ratio = assets[i-1] / liabilities[i-1]
+                if i > 0 and ratios[i-1] is not None:
+                    prev_ratio = ratios[i-1]
                     pct_change = ((current_ratio - prev_ratio) / prev_ratio) * 100
                     if pct_change > 0:
                         analysis += f"Ratio Increased by: {abs(pct_change):.2f}%\n"
@@ -524,6 +470,96 @@ def analyze_all_balance_sheet_metrics(pdf_path):
     
     return analysis
 
+def line_items_from_results(financial_rows, balance_sheet_result):
+    """Map each extracted line item label to its list of period values"""
+    rows = list(financial_rows or [])
+    if balance_sheet_result:
+        rows += balance_sheet_result["rows"]
+    return {row[0]: [value for value in row[1:] if value != ""] for row in rows}
+
+def analyze_version_changes(pdf_path):
+    """Compare key line items with the closest earlier version (DRHP, RHP, addendum) of the document"""
+    # Make sure the current version has been extracted (unchanged pages come from the cache)
+    extract_financial_data(pdf_path)
+    extract_assets_liabilities(pdf_path)
+
+    store = get_page_store(pdf_path)
+    previous_name, previous_doc = store.find_previous_version()
+    if previous_doc is None:
+        return "No earlier version of this document has been analysed yet."
+
+    previous_fingerprints = set(previous_doc.get("fingerprints", []))
+    changed_pages = [i + 1 for i, fingerprint in enumerate(store.fingerprints()) if fingerprint not in previous_fingerprints]
+
+    previous_results = previous_doc.get("results", {})
+    previous_items = line_items_from_results(
+        previous_results.get("financial_data", {}).get("value"),
+        previous_results.get("assets_liabilities", {}).get("value"),
+    )
+    current_items = line_items_from_results(
+        store.cached_result("financial_data"),
+        store.cached_result("assets_liabilities"),
+    )
+
+    result = f"Changes since {previous_name}:\n\n"
+    result += f"Changed pages: {len(changed_pages)} of {len(store.fingerprints())}\n"
+    if changed_pages:
+        result += "Pages: " + ", ".join(str(page) for page in changed_pages[:50])
+        result += " ...\n\n" if len(changed_pages) > 50 else "\n\n"
+
+    changed_items = 0
+    for label in sorted(set(previous_items) | set(current_items)):
+        before = previous_items.get(label)
+        after = current_items.get(label)
+        if before == after:
+            continue
+        changed_items += 1
+        result += f"{label}:\n"
+        result += f"Previous: {before if before is not None else 'not reported'}\n"
+        result += f"Current: {after if after is not None else 'not reported'}\n\n"
+
+    if not changed_items:
+        result += "No changes in key financial line items.\n"
+    return result
+
+def ratio_series(numerators, denominators):
+    """Period-by-period ratio, None where the denominator is zero"""
+    return [n / d if d != 0 else None for n, d in zip(numerators, denominators)]
+
+def build_metric_graph(pdf_path):
+    """Declare base extractions and the metrics derived from them for one document"""
+    graph = MetricGraph()
+    graph.add_node('financial_table', lambda: extract_financial_data(pdf_path))
+    graph.add_node('balance_sheet_table', lambda: extract_assets_liabilities(pdf_path))
+    graph.add_node('financial_metrics', lambda table: parse_tabulated_data(table) or {}, ['financial_table'])
+    graph.add_node('balance_sheet_metrics', lambda table: parse_tabulated_data(table) or {}, ['balance_sheet_table'])
+
+    for metric in ['total income', 'total expenses', 'comprehensive loss', 'comprehensive profit', 'loss per equity share']:
+        graph.add_node(f'growth:{metric}',
+                       lambda metrics, metric=metric: growth_series(metrics[metric]['values']) if metric in metrics else [],
+                       ['financial_metrics'])
+    for metric in ['total assets', 'total liabilities', 'total equity']:
+        graph.add_node(f'growth:{metric}',
+                       lambda metrics, metric=metric: growth_series(metrics[metric]['values']) if metric in metrics else [],
+                       ['balance_sheet_metrics'])
+
+    def balance_sheet_ratio(metrics, numerator, denominator):
+        if numerator not in metrics or denominator not in metrics:
+            return []
+        return ratio_series(metrics[numerator]['values'], metrics[denominator]['values'])
+
+    graph.add_node('assets_to_liabilities_ratio',
+                   lambda metrics: balance_sheet_ratio(metrics, 'total assets', 'total liabilities'),
+                   ['balance_sheet_metrics'])
+    # Same Total Liabilities / Total Equity ratio as AssetsLiabilitiesExtractor.add_doe_calculation
+    graph.add_node('debt_to_equity',
+                   lambda metrics: [ratio or 0 for ratio in balance_sheet_ratio(metrics, 'total liabilities', 'total equity')],
+                   ['balance_sheet_metrics'])
+    return graph
+
+def get_metric_graph(pdf_path):
+    return metric_graphs.get_or_compute(pdf_path, lambda: build_metric_graph(pdf_path))
+
 # Mapping intents to functions
 intents = {
     "profit": extract_financial_data,
@@ -536,7 +572,8 @@ intents = {
     "growth": display_images_from_section,
     "about": display_first_page,
     "analysis": analyze_all_metrics,
-    "balance" : analyze_all_balance_sheet_metrics
+    "balance" : analyze_all_balance_sheet_metrics,
+    "changes": analyze_version_changes
 }
 
 # Function to identify user intent
@@ -573,13 +610,25 @@ def select_pdf_file():
     else:
         return "No file selected."
 
-# Call the function to open the file dialog
-
-pdf_path = select_pdf_file()
+def answer_question(user_question):
+    """Pick the function that answers a question about a single document"""
+    intent = identify_intent(user_question)
+    if intent:
+        return intents[intent]
+    # Otherwise look the question up as a line item of already-extracted statements, then fall back to full-text search
+    return lambda pdf_path: answer_line_item(pdf_path, user_question) or search_document(pdf_path, user_question)
+
+def parse_target(user_question):
+    """Split an optional '@document' or '@all' prefix from a question"""
+    if user_question.startswith("@"):
+        target, _, question = user_question[1:].partition(" ")
+        return target, question.strip()
+    return None, user_question
 
 class ChatApp:
-    def __init__(self, root):
+    def __init__(self, root, session):
         self.root = root
+        self.session = session
         self.root.title("Financial Query Chatbot")
 
         self.root.geometry("800x600")
@@ -610,6 +659,35 @@ class ChatApp:
         self.send_button = tk.Button(self.root, text="Send", command=self.send_message)
         self.send_button.pack()
 
+        self.open_button = tk.Button(self.root, text="Open PDF", command=self.open_document)
+        self.open_button.pack(pady=5)
+
+        # Answers arrive from the per-document workers; poll for them on the Tk thread
+        self.pending = 0
+        self.root.after(100, self.poll_results)
+
+    def open_document(self, file_path=None):
+        if file_path is None:
+            file_path = filedialog.askopenfilename(
+                parent=self.root,
+                title="Select a PDF file",
+                filetypes=[("PDF files", "*.pdf")]
+            )
+        if not file_path:
+            return
+        # Opening a document that is already open reloads it, e.g. after a new version was saved over it
+        reloading = file_path in self.session.workers
+        self.session.open(file_path)
+        if reloading:
+            self.session.submit(reload_document, file_path, tag="reload")
+        else:
+            # Build the search index while the user types their first question
+            start_search_index(file_path)
+        names = ", ".join(worker.name for worker in self.session.workers.values())
+        action = "Reloaded" if reloading else "Opened"
+        self.add_message(f"Anubrata: {action} {os.path.basename(file_path)}. Open documents: {names}\n"
+                         "Prefix a question with @<document> or @all to choose which documents to ask.")
+
     def send_message(self, event=None):
         user_question = self.user_input.get()
         if user_question:
@@ -622,18 +700,46 @@ class ChatApp:
             self.root.after(100, self.generate_response, user_question)
 
     def generate_response(self, user_question):
-        intent = identify_intent(user_question)
-        
-        if intent:
-            output = intents[intent](pdf_path)
-            if isinstance(output, list):  # If the output is a list of images
-                self.add_images_to_chat(output)
-            else:
-                self.add_message("Anubrata: " + output)
-        else:
-            self.add_message("Anubrata: I'm sorry, I couldn't understand your question.")
-
-        self.enable_input()
+        target, question = parse_target(user_question)
+        if target and target != "all":
+            target = self.session.find(target)
+            if target is None:
+                self.add_message("Anubrata: I couldn't find an open document with that name.")
+                self.enable_input()
+                return
+
+        submitted = self.session.submit(answer_question(question), target)
+        if not submitted:
+            self.add_message("Anubrata: Please open a PDF first.")
+            self.enable_input()
+        self.pending += submitted
+
+    def poll_results(self):
+        try:
+            while True:
+                worker, tag, output = self.session.results.get_nowait()
+                if tag == "full_image":
+                    self.show_full_image(output)
+                    continue
+                if tag == "reload":
+                    if output:  # Only failures produce output
+                        self.add_message("Anubrata: " + output)
+                    continue
+                self.pending -= 1
+                prefix = f"Anubrata [{worker.name}]: " if len(self.session.workers) > 1 else "Anubrata: "
+                if isinstance(output, list):  # If the output is a list of images
+                    self.add_images_to_chat(output)
+                else:
+                    self.add_message(prefix + output)
+                if self.pending == 0:
+                    self.enable_input()
+                    evicted = self.session.enforce_budgets()
+                    if evicted:
+                        self.add_message(f"Anubrata: Freed memory held for {', '.join(evicted)}; "
+                                         "it is reloaded from the cache when asked about again.")
+        except queue.Empty:
+            pass
+        self.root.after(100, self.poll_results)
 
     def add_message(self, message, is_user=False):
         if message:
@@ -642,8 +748,15 @@ class ChatApp:
 
     def add_images_to_chat(self, images):
         for img in images:  # Assuming images are PIL Image objects
-            img.thumbnail((200, 200), Image.LANCZOS)  # Resize the image for chat display
-            photo = ImageTk.PhotoImage(img)
+            source = img.info.get("source")
+            if source and source[2] is None:
+                # Whole pages come from the thumbnail level of the render cache
+                thumbnail = render_service.render_source(source, "thumbnail") or img
+            else:
+                thumbnail = img
+            thumbnail = thumbnail.copy()  # Cached images must not be resized in place
+            thumbnail.thumbnail((200, 200), Image.LANCZOS)  # Resize the image for chat display
+            photo = ImageTk.PhotoImage(thumbnail)
 
             img_label = Label(self.chat_scrollable_frame, image=photo)
             img_label.image = photo  # Keep a reference to avoid garbage collection
@@ -653,6 +766,20 @@ class ChatApp:
             img_label.bind("<Button-1>", lambda e, image=img: self.open_full_image(image))
 
     def open_full_image(self, img):
+        # Render the page or region the image came from at full resolution on its document's worker;
+        # poll_results opens the window when the render arrives
+        source = img.info.get("source")
+        if source:
+            render = lambda pdf_path: render_service.render_source(source, "full") or img
+            if self.session.submit(render, source[0], tag="full_image"):
+                return
+        self.show_full_image(img)
+
+    def show_full_image(self, img):
+        if not isinstance(img, Image.Image):  # The worker reports failures as text
+            self.add_message("Anubrata: " + str(img))
+            return
+
         # Open a new window with the full-size image
         full_image_window = Toplevel(self.root)
         full_image_window.title("Full Image")
@@ -674,6 +801,12 @@ class ChatApp:
         self.send_button.config(state='normal')
 
 if __name__ == "__main__":
+    # Call the function to open the file dialog
+    pdf_path = select_pdf_file()
+
+    session = DocumentSession(estimate_document_memory, release_document_state)
     root = tk.Tk()
-    app = ChatApp(root)
+    app = ChatApp(root, session)
+    if pdf_path != "No file selected.":
+        app.open_document(pdf_path)
     root.mainloop()
@@ -0,0 +1,44 @@
+import pytest
+
+from NumberTokenizer import parse_amount, tokenize_page, values_by_line
+
+
+def values(text):
+    return tokenize_page(text).values.tolist()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1,23,45,678.90", 12345678.90),
+    ("1,234,567", 1234567.0),
+    ("(1,234.00)", -1234.0),
+    ("-1,234", -1234.0),
+    ("-", 0.0),
+    ("—", 0.0),
+])
+def test_parse_amount(text, expected):
+    assert parse_amount(text) == pytest.approx(expected)
+
+
+def test_parse_amount_rejects_broken_grouping():
+    assert parse_amount("12,345,67") is None
+    assert values("Revenue 12,345,67") == []
+
+
+def test_tokenize_page_reads_indian_and_western_grouping():
+    assert values("Revenue 1,23,45,678.90 1,234,567 (1,234.00)") == pytest.approx([12345678.90, 1234567.0, -1234.0])
+
+
+def test_dash_after_an_amount_is_nil():
+    assert values("Finance costs 1,234.00 - 5,678.00 —") == [1234.0, 0.0, 5678.0, 0.0]
+
+
+def test_dash_in_label_is_not_a_value():
+    assert values("Total - Non current 5,00,000") == [500000.0]
+    assert values("- Other income 12.50 -") == [12.5, 0.0]
+
+
+def test_nils_are_judged_per_line():
+    text = "Revenue 100 -\n- Exceptional items -\nTotal - Current 200 -"
+    tokens = tokenize_page(text)
+    assert [line.tolist() for line in values_by_line(tokens, 3)] == [[100.0, 0.0], [], [200.0, 0.0]]
+    assert tokens.columns.tolist() == [8, 12, 16, 20]
@@ -0,0 +1,81 @@
+import pytest
+
+pytest.importorskip("pdfplumber")
+
+from PageBudget import PageWorker
+from PageStream import current_rss, iter_pages
+
+PAGE_COUNT = 1000
+# Resident memory may grow this much after warm-up; without streaming it grows by megabytes per page
+RSS_GROWTH_LIMIT = 32 * 1024 * 1024
+
+
+def write_pdf(path, page_count):
+    """Write a PDF whose pages each show a few lines of statement-like text."""
+    objects = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>", b""]
+    page_ids = []
+    for page_number in range(page_count):
+        content = b"BT /F1 10 Tf 20 780 Td\n" + b"".join(
+            b"0 -14 Td (Page %d line %d Revenue from operations 1,234.00 (567.00)) Tj\n" % (page_number, line)
+            for line in range(3)) + b"ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+                       b"/Resources << /Font << /F1 1 0 R >> >> >>" % len(objects))
+        page_ids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % page_id for page_id in page_ids), page_count)
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, len(objects), xref)
+    path.write_bytes(bytes(data))
+    return str(path)
+
+
+def page_rss(page):
+    """Extract a page and report the worker's resident memory (runs in the page worker)."""
+    page.extract_text()
+    return current_rss()
+
+
+@pytest.fixture(scope="module")
+def long_pdf(tmp_path_factory):
+    return write_pdf(tmp_path_factory.mktemp("pdf") / "long.pdf", PAGE_COUNT)
+
+
+def assert_flat(samples):
+    warm = samples[len(samples) // 10]
+    assert max(samples) - warm < RSS_GROWTH_LIMIT, f"RSS grew from {warm} to {max(samples)} bytes"
+
+
+def test_iter_pages_keeps_rss_flat(long_pdf):
+    if not current_rss():
+        pytest.skip("resident memory cannot be read on this platform")
+    samples = []
+    for _, page in iter_pages(long_pdf, streaming=True):
+        page.extract_text()
+        samples.append(current_rss())
+    assert len(samples) == PAGE_COUNT
+    assert_flat(samples)
+
+
+def test_page_worker_keeps_rss_flat(long_pdf):
+    if not current_rss():
+        pytest.skip("resident memory cannot be read on this platform")
+    worker = PageWorker(long_pdf, isolate=True)
+    try:
+        samples = []
+        for page_number in range(PAGE_COUNT):
+            status, rss = worker.run(page_rss, page_number)
+            assert status == "ok"
+            samples.append(rss)
+    finally:
+        worker.stop()
+    assert_flat(samples)
@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+from SingleFlightCache import SingleFlightCache
+
+THREADS = 16
+
+
+def run_concurrently(function):
+    """Call function from THREADS threads released at the same moment; return their results."""
+    barrier = threading.Barrier(THREADS)
+    results = [None] * THREADS
+    errors = []
+
+    def call(i):
+        barrier.wait()
+        try:
+            results[i] = function()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def slow_counter(value="result", delay=0.2):
+    """A compute function that records its calls and stays in flight long enough to overlap."""
+    calls = []
+    lock = threading.Lock()
+
+    def compute():
+        with lock:
+            calls.append(1)
+        time.sleep(delay)
+        return value
+
+    return compute, calls
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = SingleFlightCache()
+    compute, calls = slow_counter()
+    results, errors = run_concurrently(lambda: cache.get_or_compute("doc.pdf", compute))
+    assert not errors
+    assert len(calls) == 1
+    assert results == ["result"] * THREADS
+    assert cache.get("doc.pdf") == "result"
+
+
+def test_failures_reach_waiters_and_are_not_cached():
+    cache = SingleFlightCache()
+    calls = []
+
+    def fail():
+        calls.append(1)
+        time.sleep(0.2)
+        raise ValueError("unreadable page")
+
+    _, errors = run_concurrently(lambda: cache.get_or_compute("doc.pdf", fail))
+    assert len(calls) == 1
+    assert len(errors) == THREADS and all(isinstance(e, ValueError) for e in errors)
+    assert "doc.pdf" not in cache
+    assert cache.get_or_compute("doc.pdf", lambda: "retried") == "retried"
+
+
+def test_extract_financial_data_runs_one_extraction(monkeypatch):
+    try:
+        import main
+    except (ImportError, OSError) as e:
+        # main needs the GUI and NLP dependencies (tkinter, spaCy and its en_core_web_sm model)
+        pytest.skip(f"main cannot be imported: {e}")
+
+    compute, calls = slow_counter("financial table")
+
+    class StubExtractor:
+        def __init__(self, pdf_path):
+            self.pdf_path = pdf_path
+
+        def extract_financial_data(self):
+            return compute()
+
+    monkeypatch.setattr(main, "FinancialDataExtractor", StubExtractor)
+    monkeypatch.setattr(main, "financial_data_cache", SingleFlightCache())
+    results, errors = run_concurrently(lambda: main.extract_financial_data("doc.pdf"))
+    assert not errors
+    assert len(calls) == 1
+    assert results == ["financial table"] * THREADS
+
+
+def test_concurrent_scans_extract_each_page_once(tmp_path):
+    pytest.importorskip("pdfplumber")
+    from PageTextStore import PageTextStore
+    from test_page_stream import write_pdf
+
+    store = PageTextStore(write_pdf(tmp_path / "doc.pdf", 50))
+    extracted = []
+    run_with_fallback = store.page_worker.run_with_fallback
+
+    def counting_run(function, page_number, fallback=None):
+        extracted.append(page_number)
+        return run_with_fallback(function, page_number, fallback)
+
+    store.page_worker.run_with_fallback = counting_run
+    try:
+        results, errors = run_concurrently(lambda: [text for _, text in store.iter_page_texts()])
+    finally:
+        store.close()
+    assert not errors
+    assert sorted(extracted) == list(range(50))
+    assert all(texts == results[0] for texts in results)